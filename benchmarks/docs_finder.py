@@ -0,0 +1,69 @@
+"""Docs lookups: `finder` over every inventory entry against the indexed `FinderIndex.search`.
+
+Run from the repository root:
+    python -m benchmarks.docs_finder [objects.inv path or url]
+
+Defaults to the Python 3 inventory, downloaded from docs.python.org.
+"""
+from timeit import default_timer
+from urllib.request import urlopen
+import random
+import sys
+
+from cogs.utils.docs import FinderIndex, finder, parse_object_inv
+
+PYTHON_DOCS = 'https://docs.python.org/3'
+QUERIES = ['str.join', 'asyncio.gather', 'dict', 'os.path', 'open', 'lst', 'collections.Counter',
+           'subprocess.run', 'json.loads', 'Thread', 'zip', 'itertools', 'datetime.now', 'print',
+           're.sub', 'contextmanager', 'await', 'getattr', 'pathlib.Path.glob', 'typing.Optional']
+
+
+def load(source: str) -> dict:
+    if '://' in source:
+        data = urlopen(source.rstrip('/') + '/objects.inv').read()
+        return parse_object_inv(data, source)
+    with open(source, 'rb') as f:
+        return parse_object_inv(f.read(), PYTHON_DOCS)
+
+
+def old_lookup(entries: dict, query: str):
+    # What get_docs used to do on every call.
+    cache = list(entries.items())
+    return finder(query, cache, key=lambda t: t[0], lazy=False)[:8]
+
+
+def main(source: str = PYTHON_DOCS):
+    entries = load(source)
+    rng = random.Random(0)
+    names = list(entries)
+    # Real queries, plus random slices of names with a character dropped, as typed by people.
+    queries = QUERIES + [name[:rng.randint(3, 12)] for name in rng.sample(names, 40)]
+    queries += [q[:len(q) // 2] + q[len(q) // 2 + 1:] for q in queries[len(QUERIES):]]
+
+    start = default_timer()
+    index = FinderIndex(entries)
+    build = default_timer() - start
+
+    for query in queries:
+        expected, got = old_lookup(entries, query), index.search(query, 8)
+        assert expected == got, f'{query!r}: {expected} != {got}'
+
+    start = default_timer()
+    for query in queries:
+        old_lookup(entries, query)
+    old = default_timer() - start
+
+    start = default_timer()
+    for query in queries:
+        index.search(query, 8)
+    new = default_timer() - start
+
+    print(f'{len(entries)} entries, {len(queries)} queries, identical results, index built in {build * 1000:.0f}ms\n')
+    print(f'{"":<10}{"total":>12}{"per query":>12}')
+    print(f'{"finder":<10}{old * 1000:>10.1f}ms{old / len(queries) * 1000:>10.2f}ms')
+    print(f'{"index":<10}{new * 1000:>10.1f}ms{new / len(queries) * 1000:>10.2f}ms')
+    print(f'\nspeedup: {old / new:.1f}x')
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
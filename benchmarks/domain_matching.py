@@ -0,0 +1,71 @@
+"""Blacklist lookups: the previous substring scan against the compiled `DomainTrie`.
+
+Run from the repository root:
+    python -m benchmarks.domain_matching [entries] [lookups]
+"""
+from timeit import default_timer
+import random
+import string
+import sys
+
+from cogs.utils.domains import DomainTrie, URL_RE
+
+TLDS = ('com', 'net', 'org', 'io', 'gg', 'co.uk', 'xyz')
+
+# How links show up in messages, every one of them has to be caught.
+WRAPPED_LINKS = ('https://grabify.link', '<https://grabify.link>', 'https://grabify.link,', '(https://grabify.link)',
+                 '[x](https://grabify.link)', 'https://grabify.link\\x', 'https://grabify.link.', 'https://grabify.link?',
+                 '"https://grabify.link"', "'https://grabify.link'", 'https://grabify.link!', 'https://grabify.link;',
+                 '||https://grabify.link||', '`https://grabify.link`', 'https://GRABIFY.link:443/x',
+                 'https://user@www.grabify.link/', 'https://grabify.link#a', 'HTTP://grabify.link*')
+
+
+def domain(rng: random.Random) -> str:
+    name = ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 12)))
+    return f'{name}.{rng.choice(TLDS)}'
+
+
+def substring_scan(blacklist, netloc: str):
+    for url in blacklist:
+        if url in netloc:
+            return url
+    return False
+
+
+def timed(function, netlocs) -> (float, int):
+    start = default_timer()
+    hits = sum(1 for netloc in netlocs if function(netloc))
+    return default_timer() - start, hits
+
+
+def main(entries: int = 10000, lookups: int = 20000):
+    rng = random.Random(0)
+    blacklist = list({domain(rng) for _ in range(entries)})
+    # A tenth of the links are ( subdomains of ) blacklisted domains, the rest are not.
+    netlocs = [rng.choice(('', 'www.', 'cdn.')) + rng.choice(blacklist) if rng.random() < 0.1 else domain(rng)
+               for _ in range(lookups)]
+
+    start = default_timer()
+    trie = DomainTrie(blacklist)
+    build = default_timer() - start
+
+    scan_time, scan_hits = timed(lambda n: substring_scan(blacklist, n), netlocs)
+    trie_time, trie_hits = timed(trie.match, netlocs)
+
+    print(f'{len(blacklist)} blacklisted domains, {lookups} lookups, trie built in {build * 1000:.1f}ms\n')
+    print(f'{"":<16}{"total":>12}{"per lookup":>14}{"hits":>8}')
+    print(f'{"substring scan":<16}{scan_time * 1000:>10.1f}ms{scan_time / lookups * 1e6:>12.2f}us{scan_hits:>8}')
+    print(f'{"domain trie":<16}{trie_time * 1000:>10.1f}ms{trie_time / lookups * 1e6:>12.2f}us{trie_hits:>8}')
+    print(f'\nspeedup: {scan_time / trie_time:.0f}x')
+    # The scan's extra hits are false positives such as `ab.com` matching `crab.com`.
+    print(f'crab.com under ab.com: scan={substring_scan(["ab.com"], "crab.com")!r} '
+          f'trie={DomainTrie(["ab.com"]).match("crab.com")!r}')
+
+    grabify = DomainTrie(['grabify.link'])
+    missed = [link for link in WRAPPED_LINKS if not any(map(grabify.match, URL_RE.findall(link)))]
+    print(f'wrapped links caught: {len(WRAPPED_LINKS) - len(missed)}/{len(WRAPPED_LINKS)}')
+    assert not missed, f'not caught: {missed}'
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:3]))
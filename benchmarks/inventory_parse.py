@@ -0,0 +1,132 @@
+"""objects.inv parse throughput: the previous line reader against the streaming `InventoryParser`.
+
+Run from the repository root:
+    python -m benchmarks.inventory_parse [objects.inv ...]
+
+Without arguments synthetic fixtures of a few sizes are generated in a temporary directory.
+"""
+from timeit import default_timer
+import tempfile
+import random
+import zlib
+import sys
+import os
+import io
+import re
+
+from cogs.utils.docs import InventoryParser
+
+URL = 'https://docs.python.org/3'
+CHUNK = 16 * 1024  # What DocsIndex reads off the response at a time.
+
+
+class LegacyReader:
+    def __init__(self, buffer):
+        self.stream = io.BytesIO(buffer)
+
+    def readline(self):
+        return self.stream.readline().decode('utf-8')
+
+    def read_compressed_chunks(self):
+        decompressor = zlib.decompressobj()
+        while True:
+            chunk = self.stream.read(16 * 1024)
+            if len(chunk) == 0:
+                break
+            yield decompressor.decompress(chunk)
+        yield decompressor.flush()
+
+    def read_compressed_lines(self):
+        buf = b''
+        for chunk in self.read_compressed_chunks():
+            buf += chunk
+            pos = buf.find(b'\n')
+            while pos != -1:
+                yield buf[:pos].decode('utf-8')
+                buf = buf[pos + 1:]
+                pos = buf.find(b'\n')
+
+
+def legacy_parse(stream, url):
+    result = {}
+    stream.readline(), stream.readline(), stream.readline()
+    stream.readline()
+    entry_regex = re.compile(r'(?x)(.+?)\s+(\S*:\S*)\s+(-?\d+)\s+(\S+)\s+(.*)')
+    for line in stream.read_compressed_lines():
+        match = entry_regex.match(line.rstrip())
+        if not match:
+            continue
+        name, directive, prio, location, dispname = match.groups()
+        domain, _, subdirective = directive.partition(':')
+        if directive == 'py:module' and name in result:
+            continue
+        if directive == 'std:doc':
+            subdirective = 'label'
+        if location.endswith('$'):
+            location = location[:-1] + name
+        key = name if dispname == '-' else dispname
+        prefix = f'{subdirective}:' if domain == 'std' else ''
+        result[f'{prefix}{key}'] = os.path.join(url, location)
+    return result
+
+
+def streaming_parse(data: bytes, url):
+    parser = InventoryParser(url)
+    for i in range(0, len(data), CHUNK):
+        parser.feed(data[i:i + CHUNK])
+    return parser.close()
+
+
+def fixture(path: str, entries: int) -> None:
+    rng = random.Random(entries)
+    words = ['get', 'set', 'run', 'load', 'dump', 'join', 'Path', 'Counter', 'Thread', 'open', 'read', 'gather',
+             'Queue', 'Lock', 'Event', 'parse', 'Client', 'Error', 'Timeout', 'mock', 'patch', 'items', 'update']
+    lines = []
+    for i in range(entries):
+        module = '.'.join(rng.choice(words).lower() for _ in range(rng.randint(1, 3)))
+        name = f'{module}.{rng.choice(words)}{i}'
+        role = rng.choice(('py:function', 'py:class', 'py:method', 'py:attribute', 'py:module', 'std:label'))
+        # Mostly plain entries, plus the odd ones real inventories have: titles with spaces, no display name
+        # at all ( a trailing space ) and CRLF line endings.
+        dispname = rng.choice(('-',) * 6 + ('Some title', '', '-\r', 'Some title \r', '\r'))
+        lines.append(f'{name} {role} 1 library/{module}.html#$ {dispname}')
+    body = zlib.compress(('\n'.join(lines) + '\n').encode(), 9)
+    with open(path, 'wb') as f:
+        f.write(b'# Sphinx inventory version 2\n# Project: Fixture\n# Version: 1\n'
+                b'# The remainder of this file is compressed using zlib.\n' + body)
+
+
+def best_of(function, repeat: int = 5) -> float:
+    times = []
+    for _ in range(repeat):
+        start = default_timer()
+        function()
+        times.append(default_timer() - start)
+    return min(times)
+
+
+def main(paths):
+    if not paths:
+        directory = tempfile.mkdtemp()
+        paths = []
+        for entries in (5000, 20000, 50000):
+            paths.append(os.path.join(directory, f'fixture-{entries}.inv'))
+            fixture(paths[-1], entries)
+
+    print(f'{"file":<22}{"entries":>9}{"inflated":>10}{"legacy":>16}{"streaming":>16}{"speedup":>9}')
+    for path in paths:
+        with open(path, 'rb') as f:
+            data = f.read()
+        inflated = len(zlib.decompress(data.split(b'\n', 4)[4]))
+        expected, got = legacy_parse(LegacyReader(data), URL), streaming_parse(data, URL)
+        assert expected == got, f'{path}: results differ'
+
+        old = best_of(lambda: legacy_parse(LegacyReader(data), URL))
+        new = best_of(lambda: streaming_parse(data, URL))
+        mb = inflated / 2 ** 20
+        print(f'{os.path.basename(path):<22}{len(got):>9}{mb:>8.1f}MB'
+              f'{mb / old:>12.1f}MB/s{mb / new:>12.1f}MB/s{old / new:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,109 @@
+"""Memory footprint of the slotted row models against the previous dict based ones.
+
+Run from the repository root:
+    python -m benchmarks.models_memory [rows]
+"""
+from datetime import datetime
+from json import dumps
+import tracemalloc
+import sys
+
+from cogs.utils.DataBase import Message, Rep, Tag, User
+
+
+class _Bot(object):
+    """Stand in for the bot reference every legacy instance carried."""
+
+
+class LegacyMessage(object):
+    def __init__(self, bot, created_at, content, message_id, channel_id, guild_id, author_id):
+        self.bot = bot
+        self.created_at = created_at
+        self.content = content
+        self.message_id = message_id
+        self.channel_id = channel_id
+        self.guild_id = guild_id
+        self.author_id = author_id
+
+
+class LegacyRep(object):
+    def __init__(self, bot, rep_id, user_id, author_id, repped_at, extra_info=None):
+        self.bot = bot
+        self.rep_id = rep_id
+        self.user_id = user_id
+        self.author_id = author_id
+        self.repped_at = repped_at
+        self.extra_info = dumps(extra_info)
+
+
+class LegacyTag(object):
+    def __init__(self, bot, guild_id, creator_id, text, name, uses=0, created_at=None):
+        self.bot = bot
+        self.guild_id = guild_id
+        self.creator_id = creator_id
+        self.text = text
+        self.name = name.lower()
+        self.uses = uses
+        self.created_at = created_at
+
+
+class LegacyUser(object):
+    def __init__(self, bot, id, *, messages, reps, commands_used=0, joined_at=None, messages_sent=0):
+        self.bot = bot
+        self.id = id
+        self.messages = messages
+        self.commands_used = commands_used
+        self.messages_sent = messages_sent
+        self.reps = reps
+        self.joined_at = joined_at
+
+
+def rows(n: int):
+    now = datetime.utcnow()
+    for i in range(n):
+        yield {
+            'message': dict(created_at=now, content='hello world', message_id=10 ** 17 + i,
+                            channel_id=739205949134471241, guild_id=739205949134471238, author_id=10 ** 17 + i % 500),
+            'rep': dict(rep_id=10 ** 17 + i, user_id=10 ** 17 + i % 500, author_id=10 ** 17 + i % 300,
+                        repped_at=now, extra_info='{"channel_id": 739205949134471241}'),
+            'tag': dict(guild_id=739205949134471238, creator_id=10 ** 17 + i % 50, text='some tag text',
+                        name=f'tag{i}', uses=i, created_at=now),
+            'user': dict(id=10 ** 17 + i, commands_used=i, joined_at=now, messages_sent=i),
+        }
+
+
+def measure(build) -> int:
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    del objects
+    return size
+
+
+def main(n: int = 100000):
+    data = list(rows(n))
+    bot = _Bot()
+
+    cases = {
+        'Message': (lambda: [LegacyMessage(bot=bot, **r['message']) for r in data],
+                    lambda: [Message(**r['message']) for r in data]),
+        'Rep': (lambda: [LegacyRep(bot=bot, **r['rep']) for r in data],
+                lambda: [Rep(**r['rep']) for r in data]),
+        'Tag': (lambda: [LegacyTag(bot=bot, **r['tag']) for r in data],
+                lambda: [Tag(**r['tag']) for r in data]),
+        'User': (lambda: [LegacyUser(bot=bot, messages=[], reps=[], **r['user']) for r in data],
+                 lambda: [User(messages=[], reps=[], **r['user']) for r in data]),
+    }
+
+    print(f'{n} instances each, bytes allocated by the instances ( excluding the shared row values )\n')
+    print(f'{"model":<10}{"legacy":>14}{"slotted":>14}{"saved":>10}')
+    for name, (legacy, slotted) in cases.items():
+        old, new = measure(legacy), measure(slotted)
+        print(f'{name:<10}{old:>14,}{new:>14,}{1 - new / old:>10.1%}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
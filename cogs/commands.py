@@ -8,113 +8,21 @@ from tabulate import tabulate
 import inspect
 import aiohttp
 import typing
-import zlib
 import re
-import os
-import io
-
-from .utils.DataBase import User
 
 from .utils.time import human_timedelta
 from .youtube import to_pages_by_lines
-from .utils.checks import is_mod
-
-
-def finder(text, collection, *, key=None, lazy=True):
-    """Credits to github.com/Rapptz"""
-    suggestions = []
-    text = str(text)
-    pat = '.*?'.join(map(re.escape, text))
-    regex = re.compile(pat, flags=re.IGNORECASE)
-    for item in collection:
-        to_search = key(item) if key else item
-        r = regex.search(to_search)
-        if r:
-            suggestions.append((len(r.group()), r.start(), item))
-
-    def sort_key(tup):
-        if key:
-            return tup[0], tup[1], key(tup[2])
-        return tup
-
-    if lazy:
-        return (z for _, _, z in sorted(suggestions, key=sort_key))
-    else:
-        return [z for _, _, z in sorted(suggestions, key=sort_key)]
-
-
-class SphinxObjectFileReader:
-    def __init__(self, buffer):
-        self.stream = io.BytesIO(buffer)
-
-    def readline(self):
-        return self.stream.readline().decode('utf-8')
-
-    def read_compressed_chunks(self):
-        decompressor = zlib.decompressobj()
-        while True:
-            chunk = self.stream.read(16 * 1024)
-            if len(chunk) == 0:
-                break
-            yield decompressor.decompress(chunk)
-        yield decompressor.flush()
-
-    def read_compressed_lines(self):
-        buf = b''
-        for chunk in self.read_compressed_chunks():
-            buf += chunk
-            pos = buf.find(b'\n')
-            while pos != -1:
-                yield buf[:pos].decode('utf-8')
-                buf = buf[pos + 1:]
-                pos = buf.find(b'\n')
-
-
-def parse_object_inv(stream, url):
-    result = {}
-    inv_version = stream.readline().rstrip()  # version info
-
-    if inv_version != '# Sphinx inventory version 2':
-        raise RuntimeError('Invalid objects.inv file version.')
-    projname = stream.readline().rstrip()[11:]  # Project name; "# Project: <name>"
-    version = stream.readline().rstrip()[11:]  # Version name; "# Version: <version>"
-
-    line = stream.readline()  # says if it's a zlib header
-    if 'zlib' not in line:
-        raise RuntimeError('Invalid objects.inv file, not z-lib compatible.')
-
-    # This code mostly comes from the Sphinx repository.
-    entry_regex = re.compile(r'(?x)(.+?)\s+(\S*:\S*)\s+(-?\d+)\s+(\S+)\s+(.*)')
-    for line in stream.read_compressed_lines():
-        match = entry_regex.match(line.rstrip())
-        if not match:
-            continue
-
-        name, directive, prio, location, dispname = match.groups()
-        domain, _, subdirective = directive.partition(':')
-        if directive == 'py:module' and name in result:
-            # From the Sphinx Repository:
-            # due to a bug in 1.1 and below,
-            # two inventory entries are created
-            # for Python modules, and the first
-            # one is correct
-            continue
-
-        if directive == 'std:doc':  # Most documentation pages have a label
-            subdirective = 'label'
-
-        if location.endswith('$'):
-            location = location[:-1] + name
-
-        key = name if dispname == '-' else dispname
-        prefix = f'{subdirective}:' if domain == 'std' else ''
-
-        if projname == 'discord.py':
-            key = key.replace('discord.ext.commands.', '').replace('discord.', '')
-
-        result[f'{prefix}{key}'] = os.path.join(url, location)
-
-    return result
+from .utils.checks import is_mod, is_admin
+from .utils.docs import DocsIndex
+
+
+# Until the registry is read from the database, and if it can't be.
+PAGE_TYPES = {
+    'latest': 'https://discordpy.readthedocs.io/en/latest',
+    'python': 'https://docs.python.org/3',
+    'pygame': 'https://www.pygame.org/docs',
+    'aiohttp': 'https://docs.aiohttp.org/en/stable'
+}
 
 
 def predicate(ctx):
@@ -124,7 +32,26 @@ def predicate(ctx):
 class Commands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self._docs_cache = None
+        self.docs_index = DocsIndex(bot.session, PAGE_TYPES, loop=bot.loop)
+        self.docs_index.start()
+        bot.loop.create_task(self.load_docs_projects())
+
+    async def load_docs_projects(self):
+        """Replace the default docs projects with the registry, see `docs projects`"""
+        try:
+            records = await self.bot.db.fetch('docs_projects.all')
+        except Exception as e:
+            print(f'Failed to load the docs projects, using the defaults: {e!r}')
+            return
+        for key in set(self.docs_index.projects) - {record['key'] for record in records}:
+            self.docs_index.remove_project(key)
+        for record in records:
+            if self.docs_index.projects.get(record['key']) != record['url']:
+                self.docs_index.inventories.pop(record['key'], None)
+                self.docs_index.projects[record['key']] = record['url']
+
+    def cog_unload(self):
+        self.docs_index.close()
 
     @commands.command(hidden=True)
     @commands.check(predicate)
@@ -226,23 +153,23 @@ class Commands(commands.Cog):
     @commands.command()
     async def top_user(self, ctx):
         """Find out who is the top user in our server!"""
-        query = """SELECT * FROM users ORDER BY messages_sent DESC LIMIT 1"""
-        top_user = await self.bot.db.fetchrow(query)
+        top_user, = await self.bot.db.get_top_users(limit=1)
 
-        user = self.bot.get_user(top_user['id'])
+        user = self.bot.get_user(top_user.id)
         if not isinstance(user, discord.User):
-            return await ctx.send(f'Could not find the top user, but his ID is {user.id}'
-                                  f'\n And he has `{top_user["messages_sent"]}`` messages')
-        await ctx.send(f'Top User: {user} \nMessages: `{top_user["messages_sent"]}`')
+            return await ctx.send(f'Could not find the top user, but his ID is {top_user.id}'
+                                  f'\n And he has `{top_user.messages_sent}`` messages')
+        await ctx.send(f'Top User: {user} \nMessages: `{top_user.messages_sent}`')
 
     @commands.command()
     async def server_messages(self, ctx):
         """Get the total amount of messages sent in the TWT Server"""
-        messages = await self.bot.db.fetchrow('SELECT COUNT(*) FROM messages')
-        count = messages['count']
+        count = await self.bot.db.get_message_count()
+        archived = await self.bot.db.archive.count()
         started_counting = datetime(year=2019, month=11, day=13)
         await ctx.send(f"I have read `{count}` messages after "
-                       f"{human_timedelta(started_counting, suffix=False, brief=True, accuracy=2)}")
+                       f"{human_timedelta(started_counting, suffix=False, brief=True, accuracy=2)}"
+                       + (f", `{archived}` of them are archived" if archived else ''))
 
     @commands.command(name='messages', aliases=['my_messages'])
     async def messages_(self, ctx, member: commands.MemberConverter = None):
@@ -250,18 +177,21 @@ class Commands(commands.Cog):
         member = member or ctx.author
 
         user = await self.bot.db.get_user(member.id)
+        stats = await self.bot.db.get_message_stats(member.id, ctx.guild and ctx.guild.id)
         embed = discord.Embed(color=member.color, description=member.mention)
         embed.set_author(name=str(member), icon_url=member.avatar_url)
         embed.add_field(name="Count", value=str(user.messages_sent))
         embed.add_field(name="Since", value=human_timedelta(user.joined_at, accuracy=2))
+        if stats.count:
+            embed.add_field(name="Stored here", value=f"{stats.count}, the first one "
+                                                       f"{human_timedelta(stats.first, accuracy=2)}")
         embed.set_footer(text=str(ctx.author), icon_url=ctx.author.avatar_url)
         await ctx.send(embed=embed)
 
     @commands.command(aliases=['lb'])
     async def scoreboard(self, ctx):
         """Scoreboard over users message count"""
-        records = await self.bot.db.fetch('SELECT * FROM users ORDER BY messages_sent DESC LIMIT 10')
-        users = [User(bot=self.bot, messages=[], reps=[], **record) for record in records]
+        users = await self.bot.db.get_top_users(limit=10)
 
         table = []
         for user in users:
@@ -273,20 +203,15 @@ class Commands(commands.Cog):
     async def reps_(self, ctx, member: commands.MemberConverter = None):
         """How many reps do you have?"""
         member = member or ctx.author
-        user = await self.bot.db.get_user(member.id, get_reps=True)
-
-        reps = user.reps
-
-        ret = f'{member.display_name} has received `{len(reps)}` reps'
+        summary = await self.bot.db.get_rep_summary(member.id, top=10)
 
-        if len(reps) > 0:
-            last_rep = max(reps, key=lambda r: r.repped_at)
-            ret += f'\nLast rep: {human_timedelta(last_rep.repped_at)}'
+        ret = f'{member.display_name} has received `{summary.total}` reps'
 
-            user_reps = {int(rep.author_id): len(list(filter(lambda x: x.author_id == rep.author_id, reps))) for rep in reps}
+        if summary.total > 0:
+            ret += f'\nLast rep: {human_timedelta(summary.last_rep)}'
 
             table = []
-            for user_id, reps in sorted(user_reps.items(), key=lambda i: i[1], reverse=True)[:10]:
+            for user_id, reps in summary.top_givers:
                 table.append((str(self.bot.get_user(user_id)), str(reps)))
 
             ret += f"\n>>> ```prolog\n{tabulate(table, headers=('User', 'Reps', ), tablefmt='fancy_grid')}\n```"
@@ -296,11 +221,11 @@ class Commands(commands.Cog):
     @commands.command(aliases=['rlb'])
     async def rep_scoreboard(self, ctx):
         """Rep scoreboard!"""
-        users = await self.bot.db.get_all_users(get_reps=True, get_messages=False)
+        leaderboard = await self.bot.db.get_rep_leaderboard(limit=10)
 
         table = []
-        for user in sorted(users, key=lambda u: len(u.reps), reverse=True)[:10]:
-            table.append((str(user), len(user.reps)))
+        for user_id, reps in leaderboard:
+            table.append((str(self.bot.get_user(user_id) or user_id), reps))
 
         await ctx.send(f'>>> ```prolog\n{tabulate(table, headers=("User", "Reps",), tablefmt="fancy_grid")}\n```')
 
@@ -325,6 +250,24 @@ class Commands(commands.Cog):
         else:
             await ctx.send(f"{ctx.author.mention} has repped **{member.display_name}**!")
 
+    @commands.command(hidden=True)
+    @commands.is_owner()
+    async def dbstats(self, ctx):
+        """Database latency, pool wait, tag cache and slow query statistics."""
+        admission = self.bot.db.admission.snapshot()
+        tags = self.bot.db.tag_cache_info()
+        lookups = tags['hits'] + tags['misses']
+        ratio = tags['hits'] / lookups if lookups else 0.0
+        text = (f"Lanes in use: {admission['in_use']}, waiting: {admission['waiting']}\n"
+                f"Background shed: {admission['shed']}, timed out: {admission['timed_out']}\n"
+                f"Message buffer: {len(self.bot.db.message_buffer)} pending, "
+                f"{self.bot.db.message_buffer.dropped} dropped\n"
+                f"Tag cache: {tags['size']} tags of {tags['guilds']} guilds, {tags['hits']} hits, "
+                f"{tags['misses']} misses, {ratio:.1%} hit rate\n"
+                + self.bot.db.metrics.to_text())
+        for page in to_pages_by_lines(text, max_size=1900):
+            await ctx.send(f'```prolog\n{page}\n```')
+
     @commands.command('pipsearch', aliases=['pip', 'pypi'])
     @commands.cooldown(2, 5, commands.BucketType.user)
     async def pipsearch(self, ctx, term, order: lambda string: string.lower() = 'relevance',
@@ -400,33 +343,15 @@ class Commands(commands.Cog):
         except:
             return await ctx.send("That message is not a poll!")
 
-    async def build_docs_lookup_table(self, page_types):
-        cache = {}
-        for key, page in page_types.items():
-            async with self.bot.session.get(page + '/objects.inv') as resp:
-                if resp.status != 200:
-                    raise RuntimeError('Cannot build docs lookup table, try again later.')
-
-                stream = SphinxObjectFileReader(await resp.read())
-                cache[key] = parse_object_inv(stream, page)
-
-        self._docs_cache = cache
-
     async def get_docs(self, ctx, key, obj):
-        page_types = {
-            'latest': 'https://discordpy.readthedocs.io/en/latest',
-            'python': 'https://docs.python.org/3',
-            'pygame': 'https://www.pygame.org/docs',
-            'aiohttp': 'https://docs.aiohttp.org/en/stable'
-        }
+        page_types = self.docs_index.projects
+        if key not in page_types:
+            return await ctx.send(f'No docs project named `{key}`, see `{ctx.prefix}docs projects`.')
 
         if obj is None:
             await ctx.send(page_types[key])
             return
 
-        if self._docs_cache is None:
-            await self.build_docs_lookup_table(page_types)
-
         obj = re.sub(r'^(?:discord\.(?:ext\.)?)?(?:commands\.)?(.+)', r'\1', obj)
 
         if key.startswith('latest'):
@@ -438,9 +363,7 @@ class Commands(commands.Cog):
                     obj = f'abc.Messageable.{name}'
                     break
 
-        cache = list(self._docs_cache[key].items())
-
-        matches = finder(obj, cache, key=lambda t: t[0], lazy=False)[:8]
+        matches = await self.docs_index.search(key, obj, limit=8)
 
         if len(matches) == 0:
             return await ctx.send('Could not find anything. Sorry.')
@@ -489,6 +412,50 @@ class Commands(commands.Cog):
         Props to github.com/Rapptz"""
         await self.get_docs(ctx, 'aiohttp', obj)
 
+    @docs.command(name='search', aliases=['s'])
+    async def search_docs(self, ctx, project: str, *, obj: str = None):
+        """Gives you a documentation link for an entity of any project in `docs projects`."""
+        await self.get_docs(ctx, project.lower(), obj)
+
+    @docs.group(name='projects', invoke_without_command=True)
+    async def docs_projects(self, ctx):
+        """Lists the projects `docs search` knows about"""
+        index = self.docs_index
+        lines = [f'{key:<12} {url}' + (f'  ( loaded, {len(index.inventories[key].entries)} entries )'
+                                        if key in index.inventories else '')
+                 for key, url in sorted(index.projects.items())]
+        await ctx.send('```' + '\n'.join(lines) + '```')
+
+    @docs_projects.command(name='add')
+    async def add_docs_project(self, ctx, key: str, url: str):
+        """Adds ( or moves ) a Sphinx documentation project, by the url its objects.inv is under."""
+        if not is_admin(ctx.author):
+            return await ctx.send('Only admins can add docs projects.')
+        key = key.lower()
+        try:
+            inventory = await self.docs_index.add_project(key, url)
+        except ValueError:
+            return await ctx.send('Project names are up to 32 lowercase letters, digits, `.`, `_` or `-`.')
+        except Exception as e:
+            return await ctx.send(f'Could not load the Sphinx inventory at `{url.rstrip("/")}/objects.inv`: {e}')
+
+        await self.bot.db.execute('docs_projects.upsert', key, inventory.url, ctx.author.id)
+        await ctx.send(f'Added `{key}` with {len(inventory.entries)} entries, '
+                       f'use `{ctx.prefix}docs search {key} <entity>`.')
+
+    @docs_projects.command(name='remove')
+    async def remove_docs_project(self, ctx, key: str):
+        """Removes a documentation project"""
+        if not is_admin(ctx.author):
+            return await ctx.send('Only admins can remove docs projects.')
+        key = key.lower()
+        if key not in self.docs_index:
+            return await ctx.send(f'No docs project named `{key}`.')
+
+        await self.bot.db.execute('docs_projects.delete', key)
+        self.docs_index.remove_project(key)
+        await ctx.send(f'Removed `{key}`.')
+
 
 def setup(bot):
     bot.add_cog(Commands(bot))
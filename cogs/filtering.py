@@ -2,16 +2,22 @@ from discord.ext import commands
 import discord
 
 from .utils.checks import is_mod
+from .utils.domains import is_domain, URL_RE
 
-from urllib.parse import urlparse
+from collections import Counter
 import asyncio
-import re
 
 
 class Filtering(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.configs = {}
+        # How far messages got before we knew they were fine, see `filter stats`.
+        self.triage = Counter()
+
+    @property
+    def configs(self):
+        """Loaded in bulk on startup and kept in sync across processes, see `FilterConfigs`"""
+        return self.bot.db.filter_configs
 
     async def cog_check(self, ctx):
         if not ctx.guild:
@@ -19,18 +25,12 @@ class Filtering(commands.Cog):
 
         return is_mod(ctx.author)
 
-    async def assure_config(self, guild_id: int):
-        if str(guild_id) not in self.configs:
-            config = await self.bot.db.get_config(guild_id)
-            self.configs[str(guild_id)] = config
-
     @commands.Cog.listener()
     async def on_message(self, message):
         await self.bot.wait_until_ready()
         if not message.guild:
             return
 
-        await self.assure_config(message.guild.id)
         await self._do_filtering(message)
 
     @commands.Cog.listener()
@@ -38,40 +38,47 @@ class Filtering(commands.Cog):
         await self.bot.wait_until_ready()
         if not before.guild:
             return
+        if before.content == after.content:  # Embeds resolving, pins etc.
+            self.triage['unchanged_edit'] += 1
+            return
 
-        await self.assure_config(after.guild.id)
         await self._do_filtering(after)
 
     async def _do_filtering(self, message: discord.Message):
-        config = self.configs[str(message.guild.id)]
+        self.triage['checked'] += 1
+        # Cheapest checks first, most messages never get to the regex.
+        if 'http' not in message.content.lower():
+            self.triage['no_link'] += 1
+            return
+
+        config = await self.configs.get(message.guild.id)
         if not config.enabled:
+            self.triage['disabled'] += 1
+            return
+        if message.channel.id in config.whitelist:
+            self.triage['whitelisted'] += 1
             return
 
-        urls = re.findall(r"(https?://[^\s]+)", message.content, flags=re.IGNORECASE)
-        for url in urls:
+        self.triage['scanned'] += 1
+        for netloc in URL_RE.findall(message.content):
             try:
-                result = urlparse(url)
-                if all([result.scheme, result.netloc]):
-                    result = await self._blacklisted_url(result.netloc, guild_id=message.guild.id)
-                    if result:
-                        if not is_mod(message.author):
-                            reply = f"The link you sent is not allowed on this server. {message.author.mention} " + \
-                                    f"If you believe this is a mistake contact a staff member."
-                            reason = config.has_reason(result)
-                            if reason:
-                                reply += '\n\n' + reason
-                            await message.delete()
-                            return await message.channel.send(reply)
+                result = await self._blacklisted_url(netloc, config=config)
+                if result:
+                    if not is_mod(message.author):
+                        reply = f"The link you sent is not allowed on this server. {message.author.mention} " + \
+                                f"If you believe this is a mistake contact a staff member."
+                        reason = config.has_reason(result)
+                        if reason:
+                            reply += '\n\n' + reason
+                        await message.delete()
+                        return await message.channel.send(reply)
 
             except Exception as e:
                 raise e  # I don't know what error could be raised, let me know an error occurs please
 
-    async def _blacklisted_url(self, netloc: str, guild_id: int) -> bool:
-        """Checks if the provided netloc is blacklisted."""
-        for url in self.configs[str(guild_id)].blacklist_urls:
-            if url in netloc:
-                return url
-        return False
+    async def _blacklisted_url(self, netloc: str, config) -> bool:
+        """Checks if the provided netloc is blacklisted, returns the blacklist entry it falls under."""
+        return config.check(netloc) or False
 
     @commands.group()
     async def filter(self, ctx):
@@ -83,10 +90,28 @@ class Filtering(commands.Cog):
                            f'Use `{ctx.prefix}filter whitelist` to manage the whitelist\n'
                            f'Use `{ctx.prefix}filter toggle` to toggle the filter.')
 
+    @filter.command(name='stats')
+    async def stats_(self, ctx):
+        """How many messages the filter had to scan for links"""
+        stats = self.triage
+        checked = stats['checked'] or 1
+        fast = stats['no_link'] + stats['disabled'] + stats['whitelisted']
+        cache = self.configs.cache_info()
+        lookups = (cache['hits'] + cache['misses']) or 1
+        await ctx.send(f'```Checked:          {stats["checked"]}\n'
+                       f'No link:          {stats["no_link"]}\n'
+                       f'Filter disabled:  {stats["disabled"]}\n'
+                       f'Whitelisted:      {stats["whitelisted"]}\n'
+                       f'Scanned:          {stats["scanned"]}\n'
+                       f'Fast path:        {fast / checked:.1%}\n'
+                       f'Unchanged edits:  {stats["unchanged_edit"]} ( skipped before checking )\n\n'
+                       f'Verdict cache:    {cache["size"]} netlocs, {cache["hits"] / lookups:.1%} hit rate '
+                       f'( {cache["hits"]} hits, {cache["misses"]} misses )```')
+
     @filter.command()
     async def toggle(self, ctx):
         """Toggle on or off the filter"""
-        config = self.configs[str(ctx.guild.id)]
+        config = await self.configs.get(ctx.guild.id)
         if config.enabled:
             enabled = 'enabled'
             disable = 'disable'
@@ -134,7 +159,10 @@ class Filtering(commands.Cog):
     @blacklist.command()
     async def add(self, ctx, url: str):
         """Add a URL to the filter"""
-        config = self.configs[str(ctx.guild.id)]
+        if not is_domain(url):
+            return await ctx.send(f'`{url}` is not a domain, use something like `example.com` '
+                                  f'( which also blocks its subdomains ).')
+        config = await self.configs.get(ctx.guild.id)
         if url in config.blacklist_urls:
             return await ctx.send(f'That url is already blacklisted.')
 
@@ -154,7 +182,7 @@ class Filtering(commands.Cog):
     @blacklist.command()
     async def remove(self, ctx, url: str):
         """Remove a URL from the filter"""
-        config = self.configs[str(ctx.guild.id)]
+        config = await self.configs.get(ctx.guild.id)
         if url not in config.blacklist_urls:
             return await ctx.send(f'That url is not blacklisted.')
 
@@ -168,7 +196,7 @@ class Filtering(commands.Cog):
     @blacklist.command()
     async def list(self, ctx):
         """List all blacklisted URLs and reasons why"""
-        config = self.configs[str(ctx.guild.id)]
+        config = await self.configs.get(ctx.guild.id)
         string = "```"
         for url in config.blacklist_urls:
             string += url
@@ -194,7 +222,7 @@ class Filtering(commands.Cog):
     @whitelist.command(name='add')
     async def add_(self, ctx, channel: commands.TextChannelConverter):
         """Add a channel to the URL filter whitelist"""
-        config = self.configs[str(ctx.guild.id)]
+        config = await self.configs.get(ctx.guild.id)
         if channel.id in config.whitelist_channels:
             return await ctx.send('That channel is already in the whitelist')
 
@@ -205,7 +233,7 @@ class Filtering(commands.Cog):
     @whitelist.command(name='remove')
     async def remove_(self, ctx, channel: commands.TextChannelConverter):
         """Remove a channel from the URL filter whitelist"""
-        config = self.configs[str(ctx.guild.id)]
+        config = await self.configs.get(ctx.guild.id)
         if channel.id not in config.whitelist_channels:
             return await ctx.send('That channel is already not whitelisted')
 
@@ -216,7 +244,7 @@ class Filtering(commands.Cog):
     @whitelist.command(name='list')
     async def list_(self, ctx):
         """List the whitelisted channels from URL filtering"""
-        config = self.configs[str(ctx.guild.id)]
+        config = await self.configs.get(ctx.guild.id)
         channels = []
         update = False
         for channel in config.whitelist_channels:
@@ -31,8 +31,7 @@ class TagCommands(commands.Cog, name="Tags"):
             return await message.delete(delay=10.0)
 
         await ctx.send("{}".format(tag.text))
-        await self.bot.db.execute("UPDATE tags SET uses = uses + 1 WHERE guild_id = $1 AND name = $2",
-                                  ctx.guild.id, name)
+        self.bot.db.tag_uses.add(ctx.guild.id, name)  # Written in bulk, see `TagUses`
 
     @tag.command()
     async def info(self, ctx, *, name: lambda inp: inp.lower()):
@@ -47,7 +46,7 @@ class TagCommands(commands.Cog, name="Tags"):
         author = self.bot.get_user(tag.creator_id)
         author = str(author) if isinstance(author, discord.User) else "(ID: {})".format(tag.creator_id)
         text = "Tag: {name}\n\n```prolog\nCreator: {author}\n   Uses: {uses}\n```" \
-            .format(name=name, author=author, uses=tag.uses)
+            .format(name=name, author=author, uses=tag.total_uses)
         await ctx.send(text)
 
     @tag.command()
@@ -56,12 +55,11 @@ class TagCommands(commands.Cog, name="Tags"):
         """Create a new tag."""
         text = await commands.clean_content().convert(ctx=ctx, argument=text)
 
-        tag = await self.bot.db.get_tag(guild_id=ctx.guild.id, name=text)
+        tag = await self.bot.db.get_tag(guild_id=ctx.guild.id, name=name)
         if tag is not None:
             return await ctx.send('A tag with that name already exists.')
 
-        tag = Tag(bot=self.bot, guild_id=ctx.guild.id,
-                  creator_id=ctx.author.id, name=name, text=text)
+        tag = Tag(guild_id=ctx.guild.id, creator_id=ctx.author.id, name=name, text=text)
         await tag.post()
         await ctx.send('You have successfully created your tag.')
 
@@ -70,8 +68,7 @@ class TagCommands(commands.Cog, name="Tags"):
     async def list(self, ctx, member: commands.MemberConverter = None):
         """List your existing tags."""
         member = member or ctx.author
-        query = """SELECT name FROM tags WHERE guild_id = $1 AND creator_id = $2 ORDER BY name"""
-        records = await self.bot.db.fetch(query, ctx.guild.id, member.id)
+        records = await self.bot.db.fetch('tags.names_by_creator', ctx.guild.id, member.id)
         if not records:
             return await ctx.send(f'No tags found.')
 
@@ -90,10 +87,7 @@ class TagCommands(commands.Cog, name="Tags"):
     @commands.cooldown(1, 3600 * 24, commands.BucketType.user)
     async def all(self, ctx: commands.Context):
         """List all existing tags alphabetically ordered and sends them in DMs."""
-        records = await self.bot.db.fetch(
-            """SELECT name FROM tags WHERE guild_id = $1 ORDER BY name""",
-            ctx.guild.id
-        )
+        records = await self.bot.db.fetch('tags.names', ctx.guild.id)
 
         if not records:
             return await ctx.send("This server doesn't have any tags.")
@@ -157,8 +151,7 @@ class TagCommands(commands.Cog, name="Tags"):
     @commands.cooldown(1, 1, commands.BucketType.user)
     async def search(self, ctx, *, term: str):
         """Search for a tag given a search term. PostgreSQL syntax must be used for the search."""
-        query = """SELECT name FROM tags WHERE guild_id = $1 AND name LIKE $2 LIMIT 10"""
-        records = await self.bot.db.fetch(query, ctx.guild.id, term)
+        records = await self.bot.db.fetch('tags.search', ctx.guild.id, term)
 
         if not records:
             return await ctx.send("No tags found that has the term in it's name", delete_after=10)
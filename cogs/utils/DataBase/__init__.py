@@ -1,6 +1,15 @@
 from .gconfig import FilterConfig
+from .configs import FilterConfigs
 from .message import Message
+from .buffer import MessageBuffer
+from .partitions import MessagePartitions
+from .archive import MessageArchive, MessageStats
+from .counters import UserCounters, TagUses
+from .queries import QueryRegistry
+from .migrations import Migration, MIGRATIONS
+from .admission import AdmissionRejected, INTERACTIVE, BACKGROUND
 from .client import DataBase
 from .user import User
-from .rep import Rep
+from .rep import Rep, RepSummary
+from .record import Record
 from .tag import Tag
@@ -0,0 +1,96 @@
+from collections import deque
+from typing import Deque, Dict
+import asyncio
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+
+class AdmissionRejected(Exception):
+    """Raised when background work can't get a connection in time, the caller should defer it and retry later."""
+
+
+class AdmissionControl(object):
+    """Hands out the pools connections to two lanes.
+
+    `INTERACTIVE` work ( commands ) may use every connection and is always served first.
+    `BACKGROUND` work ( buffered writes, bulk reads ) may never use the `reserved` connections,
+    only `max_background_queue` background callers may wait at once and none of them longer
+    than `max_background_wait` seconds, anything past that raises `AdmissionRejected`."""
+
+    def __init__(self, capacity: int, *, reserved: int = 3,
+                 max_background_queue: int = 50, max_background_wait: float = 5.0):
+        self.capacity = capacity
+        self.background_limit = max(capacity - reserved, 1)
+        self.max_background_queue = max_background_queue
+        self.max_background_wait = max_background_wait
+        self.in_use: Dict[str, int] = {INTERACTIVE: 0, BACKGROUND: 0}
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {INTERACTIVE: deque(), BACKGROUND: deque()}
+        self.shed = 0  # Background callers turned away because the queue was full.
+        self.timed_out = 0  # Background callers that waited too long.
+
+    def _has_room(self, lane: str) -> bool:
+        if sum(self.in_use.values()) >= self.capacity:
+            return False
+        if lane == BACKGROUND:
+            return self.in_use[BACKGROUND] < self.background_limit and not self._waiters[INTERACTIVE]
+        return True
+
+    def _wake(self) -> None:
+        for lane in (INTERACTIVE, BACKGROUND):
+            waiters = self._waiters[lane]
+            while waiters and self._has_room(lane):
+                future = waiters.popleft()
+                if not future.done():
+                    self.in_use[lane] += 1
+                    future.set_result(None)
+
+    async def acquire(self, lane: str = INTERACTIVE) -> None:
+        if lane not in self.in_use:
+            raise ValueError(f'Unknown lane {lane!r}')
+
+        if not self._waiters[lane] and self._has_room(lane):
+            self.in_use[lane] += 1
+            return
+
+        if lane == BACKGROUND and len(self._waiters[BACKGROUND]) >= self.max_background_queue:
+            self.shed += 1
+            raise AdmissionRejected(f'{len(self._waiters[BACKGROUND])} background queries are already waiting')
+
+        future = asyncio.get_event_loop().create_future()
+        self._waiters[lane].append(future)
+        try:
+            if lane == BACKGROUND:
+                await asyncio.wait_for(future, timeout=self.max_background_wait)
+            else:
+                await future
+        except asyncio.TimeoutError:
+            self._give_up(lane, future)
+            self.timed_out += 1
+            raise AdmissionRejected(f'Waited more than {self.max_background_wait}s for a connection')
+        except BaseException:
+            self._give_up(lane, future)
+            raise
+
+    def _give_up(self, lane: str, future: asyncio.Future) -> None:
+        if future.done() and not future.cancelled():
+            # We were handed a slot right as we stopped waiting, pass it on.
+            self.release(lane)
+        else:
+            try:
+                self._waiters[lane].remove(future)
+            except ValueError:
+                pass
+            self._wake()  # Background work may have been queued behind us.
+
+    def release(self, lane: str = INTERACTIVE) -> None:
+        self.in_use[lane] -= 1
+        self._wake()
+
+    def snapshot(self) -> dict:
+        return {'capacity': self.capacity,
+                'background_limit': self.background_limit,
+                'in_use': dict(self.in_use),
+                'waiting': {lane: len(waiters) for lane, waiters in self._waiters.items()},
+                'shed': self.shed,
+                'timed_out': self.timed_out}
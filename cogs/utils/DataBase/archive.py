@@ -0,0 +1,250 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, NamedTuple, Optional
+from json import dumps
+import numpy as np
+import asyncio
+import shutil
+import zlib
+import os
+
+from .admission import AdmissionRejected, BACKGROUND
+from .partitions import month_start, next_month
+from .message import Message
+
+
+class MessageStats(NamedTuple):
+    count: int
+    first: Optional[datetime]
+    last: Optional[datetime]
+
+    def __add__(self, other: 'MessageStats') -> 'MessageStats':
+        firsts = [d for d in (self.first, other.first) if d is not None]
+        lasts = [d for d in (self.last, other.last) if d is not None]
+        return MessageStats(count=self.count + other.count,
+                            first=min(firsts) if firsts else None,
+                            last=max(lasts) if lasts else None)
+
+
+EMPTY_STATS = MessageStats(count=0, first=None, last=None)
+
+
+class ArchivedMonth(object):
+    """One month of archived messages, stored column by column in `path`.
+
+    Ids and timestamps are plain .npy files that are memory-mapped on first use, the rows are sorted by
+    ( author_id, created_at ) so a users messages are found by binary search. Contents are one zlib stream
+    of the UTF-8 encoded contents back to back, with `content_offsets` marking where each one ends."""
+
+    int_columns = ('message_id', 'guild_id', 'channel_id', 'author_id')
+
+    def __init__(self, path: str):
+        self.path = path
+        self.month = datetime.strptime(os.path.basename(path), '%Y-%m')
+        self._columns: Dict[str, np.ndarray] = {}
+        self._guild_counts: Optional[Dict[int, int]] = None
+
+    def __len__(self):
+        return len(self.column('message_id'))
+
+    def column(self, name: str) -> np.ndarray:
+        array = self._columns.get(name)
+        if array is None:
+            array = self._columns[name] = np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+        return array
+
+    def guild_counts(self) -> Dict[int, int]:
+        if self._guild_counts is None:
+            guilds, counts = np.unique(self.column('guild_id'), return_counts=True)
+            self._guild_counts = dict(zip(guilds.tolist(), counts.tolist()))
+        return self._guild_counts
+
+    def count(self, guild_id: int = None) -> int:
+        if guild_id is None:
+            return len(self)
+        return self.guild_counts().get(guild_id, 0)
+
+    def stats(self, author_id: int, guild_id: int = None) -> MessageStats:
+        authors = self.column('author_id')
+        lo, hi = np.searchsorted(authors, author_id, 'left'), np.searchsorted(authors, author_id, 'right')
+        created_at = self.column('created_at')[lo:hi]
+        if guild_id is not None:
+            created_at = created_at[self.column('guild_id')[lo:hi] == guild_id]
+        if not len(created_at):
+            return EMPTY_STATS
+        # Sorted by created_at within an author.
+        return MessageStats(count=len(created_at), first=created_at[0].astype(datetime),
+                            last=created_at[-1].astype(datetime))
+
+    def messages(self) -> Iterator[Message]:
+        """Every archived `Message` of this month, contents are decompressed as we go."""
+        columns = [self.column(name) for name in self.int_columns + ('created_at',)]
+        offsets = self.column('content_offsets')
+        decompressor = zlib.decompressobj()
+        pending, start = b'', 0
+
+        with open(os.path.join(self.path, 'content.zlib'), 'rb') as f:
+            for i in range(len(self)):
+                end = int(offsets[i])
+                while len(pending) < end - start:
+                    chunk = f.read(1 << 16)
+                    if not chunk:
+                        pending += decompressor.flush()
+                        break
+                    pending += decompressor.decompress(chunk)
+                content, pending = pending[:end - start], pending[end - start:]
+                start = end
+
+                message_id, guild_id, channel_id, author_id, created_at = (c[i] for c in columns)
+                yield Message(message_id=int(message_id), guild_id=int(guild_id), channel_id=int(channel_id),
+                              author_id=int(author_id), created_at=created_at.astype(datetime),
+                              content=content.decode())
+
+
+class MessageArchive(object):
+    """Moves messages older than `archive_after` out of postgres, into one `ArchivedMonth` per month under `path`.
+
+    Every `interval` seconds each month that lies entirely before the cutoff is streamed out of the
+    `messages` table, written to disk and then purged from the table, oldest month first.
+    Historical questions ( `count`, `user_stats` ) are answered from the memory-mapped files,
+    in the default executor so the event loop never waits on the disk."""
+
+    def __init__(self, db, path: str = 'message_archive', *, archive_after: timedelta = None,
+                 chunk_size: int = 10000, interval: float = 24 * 3600):
+        self.db = db
+        self.path = path
+        self.archive_after = archive_after
+        self.chunk_size = chunk_size
+        self.interval = interval
+        self._months: Dict[datetime, ArchivedMonth] = {}
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    def months(self) -> List[ArchivedMonth]:
+        if not os.path.isdir(self.path):
+            return []
+        for name in os.listdir(self.path):
+            # Months that are still being written have no meta.json yet.
+            if name.endswith('.tmp') or not os.path.exists(os.path.join(self.path, name, 'meta.json')):
+                continue
+            month = datetime.strptime(name, '%Y-%m')
+            if month not in self._months:
+                self._months[month] = ArchivedMonth(os.path.join(self.path, name))
+        return [self._months[month] for month in sorted(self._months)]
+
+    def _count(self, guild_id: int = None) -> int:
+        return sum(month.count(guild_id) for month in self.months())
+
+    def _user_stats(self, author_id: int, guild_id: int = None) -> MessageStats:
+        stats = EMPTY_STATS
+        for month in self.months():
+            stats += month.stats(author_id, guild_id)
+        return stats
+
+    async def count(self, guild_id: int = None) -> int:
+        """Archived messages of `guild_id`, or of all guilds"""
+        return await self.db.bot.loop.run_in_executor(None, self._count, guild_id)
+
+    async def user_stats(self, author_id: int, guild_id: int = None) -> MessageStats:
+        """Archived messages of `author_id`, in `guild_id` or in all guilds"""
+        return await self.db.bot.loop.run_in_executor(None, self._user_stats, author_id, guild_id)
+
+    def start(self) -> None:
+        if self._task is None and self.archive_after is not None:
+            self._task = self.db.bot.loop.create_task(self._archive_loop())
+
+    async def _archive_loop(self):
+        while True:
+            try:
+                await self.archive(datetime.utcnow() - self.archive_after)
+            except asyncio.CancelledError:
+                raise
+            except AdmissionRejected:
+                pass  # Busy with commands, try again next time.
+            except Exception as e:
+                print(f'Failed to archive messages: {e!r}')
+            await asyncio.sleep(self.interval)
+
+    async def archive(self, cutoff: datetime) -> List[datetime]:
+        """Archive every month that ends before `cutoff`, returns the months archived."""
+        archived = []
+        async with self._lock:
+            oldest = await self.db.fetchval('messages.oldest', lane=BACKGROUND)
+            if oldest is None:
+                return archived
+
+            month = month_start(oldest)
+            while next_month(month) <= cutoff:
+                if not os.path.exists(os.path.join(self.path, f'{month:%Y-%m}', 'meta.json')):
+                    await self._write_month(month)
+                    archived.append(month)
+                # Also if the month was written before, we may have stopped before purging it.
+                await self.db.partitions.purge(next_month(month))
+                month = next_month(month)
+
+        if archived:
+            print(f'Archived messages of {", ".join(f"{m:%Y-%m}" for m in archived)}')
+        return archived
+
+    async def _write_month(self, month: datetime) -> None:
+        end = next_month(month)
+        count = await self.db.fetchval('messages.count_range', month, end, lane=BACKGROUND)
+        final = os.path.join(self.path, f'{month:%Y-%m}')
+        tmp = final + '.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+
+        columns = {name: np.lib.format.open_memmap(os.path.join(tmp, f'{name}.npy'), mode='w+',
+                                                   dtype=np.int64, shape=(count,))
+                   for name in ArchivedMonth.int_columns}
+        columns['created_at'] = np.lib.format.open_memmap(os.path.join(tmp, 'created_at.npy'), mode='w+',
+                                                          dtype='datetime64[us]', shape=(count,))
+        offsets = np.lib.format.open_memmap(os.path.join(tmp, 'content_offsets.npy'), mode='w+',
+                                            dtype=np.int64, shape=(count,))
+        compressor = zlib.compressobj(level=6)
+        written, position = 0, 0
+
+        with open(os.path.join(tmp, 'content.zlib'), 'wb') as content:
+            chunk = []
+            async for record in self.db.cursor('messages.range', month, end, prefetch=self.chunk_size):
+                chunk.append(record)
+                if len(chunk) < self.chunk_size:
+                    continue
+                written, position = self._write_chunk(chunk, columns, offsets, content, compressor, written, position)
+                chunk = []
+            written, position = self._write_chunk(chunk, columns, offsets, content, compressor, written, position)
+            content.write(compressor.flush())
+
+        if written != count:
+            # Nothing should write to months this old, but never delete rows we didn't archive.
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise RuntimeError(f'Expected {count} messages for {month:%Y-%m}, read {written}')
+
+        for array in (*columns.values(), offsets):
+            array.flush()
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            f.write(dumps({'month': f'{month:%Y-%m}', 'count': count, 'archived_at': datetime.utcnow().isoformat()}))
+        os.replace(tmp, final)
+
+    @staticmethod
+    def _write_chunk(chunk, columns, offsets, content, compressor, written: int, position: int):
+        if not chunk:
+            return written, position
+        end = written + len(chunk)
+        for name in ArchivedMonth.int_columns:
+            columns[name][written:end] = [record[name] for record in chunk]
+        columns['created_at'][written:end] = np.array([record['created_at'] for record in chunk],
+                                                      dtype='datetime64[us]')
+
+        encoded = [(record['content'] or '').encode() for record in chunk]
+        offsets[written:end] = position + np.cumsum([len(e) for e in encoded])
+        content.write(compressor.compress(b''.join(encoded)))
+        return end, int(offsets[end - 1])
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
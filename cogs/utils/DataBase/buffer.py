@@ -0,0 +1,144 @@
+from collections import Counter
+from typing import List
+import asyncpg
+import asyncio
+
+from .admission import AdmissionRejected, BACKGROUND
+from .message import Message
+
+
+class MessageBuffer(object):
+    """Write-behind buffer for `Message` rows.
+
+    Messages are queued in memory and written in bulk with COPY,
+    either once `flush_size` messages are pending or every `flush_interval` seconds.
+    The queue is bounded by `max_size`, once it is full `put` waits for the next flush, but no longer than
+    `put_timeout` seconds.
+    A batch that failed to write is kept and retried before the queue is drained again."""
+
+    columns = ('message_id', 'guild_id', 'channel_id', 'author_id', 'content', 'created_at')
+
+    def __init__(self, db, *, flush_size: int = 500, flush_interval: float = 2.0, max_size: int = 10000,
+                 put_timeout: float = 10.0):
+        self.db = db
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.dropped = 0  # Messages that found the buffer full for longer than `put_timeout`.
+        self._queue = asyncio.Queue(maxsize=max_size)
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._failed: List[tuple] = []  # Records of a failed flush, retried before anything else.
+        self._flushing: List[tuple] = []  # Records currently being written.
+        self._task = None
+
+    def __len__(self):
+        return self._queue.qsize() + len(self._failed) + len(self._flushing)
+
+    def pending(self, guild_id: int = None) -> int:
+        """Buffered messages that aren't written yet, for `guild_id` or all guilds."""
+        if guild_id is None:
+            return len(self)
+        # asyncio.Queue keeps its items in a deque.
+        queued = sum(1 for message in self._queue._queue if message.guild_id == guild_id)
+        return queued + sum(1 for record in self._failed + self._flushing if record[1] == guild_id)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = self.db.bot.loop.create_task(self._flush_loop())
+
+    async def put(self, message: Message) -> bool:
+        """Queue `message` to be written with the next flush, returns whether it was queued.
+
+        Waits at most `put_timeout` seconds for room, after that the message is dropped and counted in `dropped`.
+        Every waiting caller holds on to its message, so waiting for as long as the database is down would
+        pile them up in memory just the same."""
+        if self._queue.full():
+            self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._queue.put(message), timeout=self.put_timeout)
+        except asyncio.TimeoutError:
+            self.dropped += 1
+            return False
+        if self._queue.qsize() >= self.flush_size:
+            self._wakeup.set()
+        return True
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except AdmissionRejected:
+                pass  # The pool is busy with commands, the batch stays buffered until the next flush.
+            except Exception as e:
+                print(f'Failed to flush {len(self)} buffered messages: {e!r}')
+
+    async def flush(self) -> int:
+        """Write every queued message, returns the amount of messages written."""
+        async with self._flush_lock:
+            written = 0
+            if self._failed:
+                # Retried on its own, the queue is only drained once it went through. So while the database
+                # is unavailable the queue stays full, `put` waits and at most `max_size` records are held here.
+                records, self._failed = self._failed, []
+                written += await self._write_batch(records)
+
+            records = []
+            while not self._queue.empty():
+                records.append(self._queue.get_nowait().as_record())
+            return written + await self._write_batch(records)
+
+    async def _write_batch(self, records: List[tuple]) -> int:
+        if not records:
+            return 0
+
+        self._flushing = records
+        try:
+            await self._write(records)
+        except Exception:
+            self._failed = records
+            raise
+        finally:
+            self._flushing = []
+        return len(records)
+
+    async def _write(self, records: List[tuple]) -> None:
+        """Write `records` and bump `message_counts` by what was actually inserted, in one transaction."""
+        queries = self.db.queries
+        async with self.db.acquire(lane=BACKGROUND) as con:
+            with self.db.metrics.measure('messages.flush', records):
+                async with con.transaction():
+                    try:
+                        async with con.transaction():
+                            await con.copy_records_to_table('messages', records=records, columns=self.columns,
+                                                            timeout=self.db.timeout)
+                        guild_ids = [record[1] for record in records]
+                    except asyncpg.UniqueViolationError:
+                        # COPY can't skip conflicts, fall back to the slower statement that can.
+                        rows = await queries.run(con, 'messages.insert_many', 'fetch', list(zip(*records)),
+                                                 timeout=self.db.timeout)
+                        guild_ids = [row['guild_id'] for row in rows]
+
+                    counts = Counter(guild_ids)
+                    if counts:
+                        await queries.run(con, 'message_counts.add', 'execute',
+                                          (list(counts), list(counts.values())), timeout=self.db.timeout)
+
+    async def close(self) -> None:
+        """Stop the flush loop and write whatever is left in the buffer."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
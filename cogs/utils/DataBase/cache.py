@@ -0,0 +1,110 @@
+from collections import OrderedDict
+from typing import Hashable
+from time import monotonic
+
+
+class LRUSet(object):
+    """A set that forgets its least recently used members once it holds more than `maxsize` of them."""
+
+    def __init__(self, maxsize: int = 50000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, item: Hashable) -> bool:
+        if item in self._data:
+            self._data.move_to_end(item)
+            return True
+        return False
+
+    def add(self, item: Hashable) -> None:
+        self._data[item] = None
+        self._data.move_to_end(item)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def discard(self, item: Hashable) -> None:
+        self._data.pop(item, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class LRUCache(object):
+    """A mapping that evicts its least recently used key once it holds more than `maxsize` keys."""
+
+    def __init__(self, maxsize: int = 1000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: Hashable, default=None):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class TTLCache(object):
+    """A mapping with a size bound and a time to live.
+
+    The least recently used key is evicted once there are more than `maxsize` keys,
+    and keys are treated as missing once they are older than `ttl` seconds."""
+
+    def __init__(self, maxsize: int = 1000, ttl: float = 600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> ( expires_at, value )
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        item = self._data.get(key)
+        return item is not None and item[0] > monotonic()
+
+    def get(self, key: Hashable, default=None):
+        item = self._data.get(key)
+        if item is None or item[0] <= monotonic():
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key: Hashable, value) -> None:
+        self._data[key] = (monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default=None):
+        item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self) -> None:
+        self._data.clear()
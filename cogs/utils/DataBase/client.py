@@ -1,55 +1,336 @@
-from typing import List
-from json import loads
+from contextlib import asynccontextmanager, contextmanager
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from json import dumps, loads
 import asyncpg
 import asyncio
+import time
+import re
 
 from .tag import Tag
-from .rep import Rep
+from .rep import Rep, RepSummary
 from .user import User
 from .message import Message
+from .buffer import MessageBuffer
+from .partitions import MessagePartitions
+from .archive import MessageArchive, MessageStats
+from .counters import UserCounters, TagUses
+from .cache import LRUSet, TTLCache
+from .leaderboard import RepLeaderboard
+from .cooldowns import RepCooldowns
+from .queries import QueryRegistry
+from .migrations import migrate, missing_indexes
+from .admission import AdmissionControl, INTERACTIVE, BACKGROUND
 from .gconfig import FilterConfig
+from .configs import FilterConfigs
+from .record import Record
+
+
+async def _next(iterator):
+    """Next item of an async iterator, or None once it's exhausted"""
+    if iterator is None:
+        return None
+    try:
+        return await iterator.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+class LatencyHistogram(object):
+    """Fixed bucket latency histogram, bucket bounds are in milliseconds."""
+    bounds = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    __slots__ = ('buckets', 'count', 'errors', 'total', 'max')
+
+    def __init__(self):
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms: float, failed: bool = False) -> None:
+        i = 0
+        while i < len(self.bounds) and ms > self.bounds[i]:
+            i += 1
+        self.buckets[i] += 1
+        self.count += 1
+        self.errors += failed
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p: float) -> float:
+        """Upper bound of the bucket holding the `p`th percentile"""
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for bound, n in zip(self.bounds, self.buckets):
+            seen += n
+            if seen >= rank:
+                return float(bound)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {'count': self.count, 'errors': self.errors, 'mean_ms': round(self.mean, 3),
+                'p50_ms': self.percentile(50), 'p95_ms': self.percentile(95), 'p99_ms': self.percentile(99),
+                'max_ms': round(self.max, 3), 'buckets': dict(zip([*map(str, self.bounds), 'inf'], self.buckets))}
+
+
+class QueryMetrics(object):
+    """Where our database time goes.
+
+    Latency per query shape ( the registered name, or the whitespace normalized SQL ),
+    time spent waiting for a pooled connection, queries in flight and a log of slow queries."""
+
+    def __init__(self, *, slow_threshold: float = 500.0, slow_log_size: int = 50):
+        self.slow_threshold = slow_threshold  # ms
+        self.shapes: Dict[str, LatencyHistogram] = {}
+        self.acquire_wait = LatencyHistogram()
+        self.waiting = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.slow_queries = deque(maxlen=slow_log_size)
+        self.started_at = datetime.utcnow()
+
+    @staticmethod
+    def shape(query: str) -> str:
+        return re.sub(r'\s+', ' ', query).strip()[:120]
+
+    @asynccontextmanager
+    async def waiting_for_connection(self):
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.waiting -= 1
+            self.acquire_wait.add((time.perf_counter() - start) * 1000)
+
+    @contextmanager
+    def measure(self, query: str, args=()):
+        shape = self.shape(query)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        start = time.perf_counter()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            self.in_flight -= 1
+            ms = (time.perf_counter() - start) * 1000
+            histogram = self.shapes.get(shape)
+            if histogram is None:
+                histogram = self.shapes[shape] = LatencyHistogram()
+            histogram.add(ms, failed=failed)
+
+            if ms >= self.slow_threshold:
+                self.slow_queries.append((datetime.utcnow().isoformat(), shape, round(ms, 3), len(args)))
+                print(f'Slow query ( {ms:.0f}ms ): {shape}')
+
+    def snapshot(self) -> dict:
+        return {'since': self.started_at.isoformat(),
+                'taken_at': datetime.utcnow().isoformat(),
+                'in_flight': self.in_flight,
+                'max_in_flight': self.max_in_flight,
+                'waiting_for_connection': self.waiting,
+                'acquire_wait': self.acquire_wait.to_dict(),
+                'queries': {shape: h.to_dict() for shape, h in self.shapes.items()},
+                'slow_queries': list(self.slow_queries)}
+
+    def to_text(self, limit: int = 15) -> str:
+        wait = self.acquire_wait
+        lines = [f'In flight: {self.in_flight} ( max {self.max_in_flight} ), waiting: {self.waiting}',
+                 f'Acquire wait: n={wait.count} mean={wait.mean:.1f}ms p95<={wait.percentile(95):.0f}ms '
+                 f'max={wait.max:.1f}ms',
+                 '']
+        shapes = sorted(self.shapes.items(), key=lambda i: i[1].total, reverse=True)[:limit]
+        for shape, h in shapes:
+            lines.append(f'{shape[:60]}\n    n={h.count} err={h.errors} total={h.total / 1000:.1f}s '
+                         f'mean={h.mean:.1f}ms p95<={h.percentile(95):.0f}ms max={h.max:.1f}ms')
+        if self.slow_queries:
+            lines.append(f'\nSlow queries ( >= {self.slow_threshold:.0f}ms ):')
+            lines.extend(f'{at} {ms}ms {shape[:60]}' for at, shape, ms, _ in list(self.slow_queries)[-5:])
+        return '\n'.join(lines)
 
 
 class DataBase(object):
-    def __init__(self, bot, pool, loop=None, timeout: float = 60.0):
+    def __init__(self, bot, pool, loop=None, timeout: float = 60.0, queries: QueryRegistry = None,
+                 message_retention: timedelta = None, archive_after: timedelta = None):
         self.bot = bot
         self._pool = pool
+        Record.db = self
+        self.queries = queries or QueryRegistry()
+        self.metrics = QueryMetrics()
+        self.metrics_path = 'db_metrics.json'
+        self._metrics_task = None
         self._loop = loop or asyncio
         self.timeout = timeout
-        self._rate_limit = asyncio.Semaphore(value=self._pool._maxsize, loop=self._loop)
+        self.admission = AdmissionControl(self._pool._maxsize)
+        self.uri = None  # Set by `create_pool`, for connections of our own.
+        self.message_buffer = MessageBuffer(self)
+        self.partitions = MessagePartitions(self, retention=message_retention)
+        self.archive = MessageArchive(self, archive_after=archive_after)
+        self.counters = UserCounters(self)
+        self.tag_uses = TagUses(self)
+        self.filter_configs = FilterConfigs(self)
+        self.rep_leaderboard = RepLeaderboard(self)
+        self.rep_cooldowns = RepCooldowns(self)
+        self._rep_summaries = TTLCache(maxsize=1000, ttl=3600.0)  # user_id -> ( top, RepSummary )
+        self._known_users = LRUSet(maxsize=50000)  # Ids that are known to have a users row.
+        self._user_lookups: Dict[Tuple[int, str], asyncio.Task] = {}  # ( user_id, lane ) -> upsert
+        self._tag_cache: Dict[int, TTLCache] = {}  # guild_id -> { name: Tag or None }
+        self._tag_generation: Dict[int, int] = {}  # Bumped per guild on every invalidation.
 
     @classmethod
     async def create_pool(cls, bot, uri=None, *, min_connections=10, max_connections=10,
-                          timeout=60.0, loop=None, **kwargs):
-        pool = await asyncpg.create_pool(uri, min_size=min_connections, max_size=max_connections, **kwargs)
-        self = cls(bot=bot, pool=pool, loop=loop, timeout=timeout)
+                          timeout=60.0, loop=None, message_retention: timedelta = None,
+                          archive_after: timedelta = None, **kwargs):
+        queries = QueryRegistry()
+        init = kwargs.pop('init', None)
+
+        async def init_connection(con):
+            await queries.prepare_all(con)
+            if init is not None:
+                await init(con)
+
+        pool = await asyncpg.create_pool(uri, min_size=min_connections, max_size=max_connections,
+                                         init=init_connection, **kwargs)
+        self = cls(bot=bot, pool=pool, loop=loop, timeout=timeout, queries=queries,
+                   message_retention=message_retention, archive_after=archive_after)
+        self.uri = uri
+        await self._setup()
+        self.partitions.start()
+        self.archive.start()
+        self.message_buffer.start()
+        self.counters.start()
+        self.tag_uses.start()
+        await self.rep_cooldowns.load()
+        await self.filter_configs.start()
+        self._metrics_task = bot.loop.create_task(self._write_metrics())
         print('Established DataBase pool with {} - {} connections\n'.format(min_connections, max_connections))
         return self
 
-    async def fetch(self, query, *args):
-        async with self._rate_limit:
-            async with self._pool.acquire() as con:
-                return await con.fetch(query, *args, timeout=self.timeout)
+    async def _setup(self) -> None:
+        """Bring the schema up to date and warn about indexes the hot paths rely on."""
+        applied = await migrate(self)
+        if applied:
+            print(f'Applied DataBase migrations {", ".join(map(str, applied))}')
+            self.queries.reset()  # Statements prepared by the pool may refer to tables that were replaced.
+
+        missing = await missing_indexes(self)
+        if missing:
+            print('WARNING: missing DataBase indexes, these queries will scan:\n  ' + '\n  '.join(missing))
+
+    async def _write_metrics(self, interval: float = 60.0):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                with open(self.metrics_path, 'w') as f:
+                    f.write(dumps({**self.metrics.snapshot(), 'admission': self.admission.snapshot()}, indent=2))
+            except OSError as e:
+                print(f'Failed to write {self.metrics_path}: {e!r}')
+
+    @asynccontextmanager
+    async def acquire(self, *, lane: str = INTERACTIVE):
+        """Acquire a connection of our own, for transactions and other multi statement work.
+
+        `lane` is `INTERACTIVE` for anything a user is waiting on and `BACKGROUND` for everything else,
+        background work may raise `AdmissionRejected` and should be retried later, see `AdmissionControl`."""
+        async with self.metrics.waiting_for_connection():
+            await self.admission.acquire(lane)
+            try:
+                con = await self._pool.acquire()
+            except BaseException:
+                self.admission.release(lane)
+                raise
+
+        try:
+            yield con
+        finally:
+            await self._pool.release(con)
+            self.admission.release(lane)
+
+    async def _run(self, method: str, query: str, args, lane: str = INTERACTIVE):
+        """`query` is either the name of a statement in `self.queries` or plain SQL."""
+        async with self.acquire(lane=lane) as con:
+            with self.metrics.measure(query, args):
+                if query in self.queries:
+                    return await self.queries.run(con, query, method, args, timeout=self.timeout)
+                if method == 'executemany':
+                    return await con.executemany(query, args, timeout=self.timeout)
+                return await getattr(con, method)(query, *args, timeout=self.timeout)
+
+    async def fetch(self, query, *args, lane: str = INTERACTIVE):
+        return await self._run('fetch', query, args, lane)
+
+    async def fetchrow(self, query, *args, lane: str = INTERACTIVE):
+        return await self._run('fetchrow', query, args, lane)
+
+    async def fetchval(self, query, *args, lane: str = INTERACTIVE):
+        return await self._run('fetchval', query, args, lane)
+
+    async def execute(self, query: str, *args, lane: str = INTERACTIVE):
+        return await self._run('execute', query, args, lane)
+
+    async def executemany(self, query: str, args, lane: str = INTERACTIVE):
+        return await self._run('executemany', query, args, lane)
+
+    async def copy_records_to_table(self, table: str, *, records, columns=None, lane: str = BACKGROUND):
+        async with self.acquire(lane=lane) as con:
+            with self.metrics.measure(f'COPY {table}', records):
+                return await con.copy_records_to_table(table, records=records, columns=columns, timeout=self.timeout)
+
+    async def close(self) -> None:
+        """Write everything that is still buffered and close the pool."""
+        if self._metrics_task is not None:
+            self._metrics_task.cancel()
+        # One that fails ( the database may be gone by now ) mustn't keep the others from draining.
+        for name in ('filter_configs', 'archive', 'partitions', 'message_buffer', 'counters', 'tag_uses'):
+            try:
+                await getattr(self, name).close()
+            except Exception as e:
+                print(f'Failed to close {name}: {e!r}')
+        await self._pool.close()
+
+    async def _upsert_user(self, user_id: int, lane: str = INTERACTIVE):
+        """Insert the users row for `user_id` if it is missing and return it, in a single statement.
+        Concurrent calls for the same id share one query, but never one of a lower lane."""
+        task = self._user_lookups.get((user_id, INTERACTIVE))
+        if task is None and lane == BACKGROUND:
+            task = self._user_lookups.get((user_id, BACKGROUND))
+        if task is None:
+            key = (user_id, lane)
+            task = self.bot.loop.create_task(self._fetch_user_row(user_id, lane))
+            task.add_done_callback(lambda _: self._user_lookups.pop(key, None))
+            self._user_lookups[key] = task
 
-    async def fetchrow(self, query, *args):
-        async with self._rate_limit:
-            async with self._pool.acquire() as con:
-                return await con.fetchrow(query, *args, timeout=self.timeout)
+        record = await asyncio.shield(task)
+        self._known_users.add(user_id)
+        return record
 
-    async def execute(self, query: str, *args):
-        async with self._rate_limit:
-            async with self._pool.acquire() as con:
-                return await con.execute(query, *args, timeout=self.timeout)
+    async def _fetch_user_row(self, user_id: int, lane: str):
+        record = await self.fetchrow('users.upsert', user_id, datetime.utcnow(), lane=lane)
+        if record is None:
+            # Another process inserted it concurrently, ON CONFLICT waited for that insert,
+            # but the SELECT of the upsert only sees the snapshot from before it.
+            record = await self.fetchrow('users.get', user_id, lane=lane)
+        return record
+
+    async def ensure_user(self, user_id: int, *, lane: str = INTERACTIVE) -> None:
+        """Assure that `user_id` has a users row, without a query if we've already seen it."""
+        if user_id not in self._known_users:
+            await self._upsert_user(user_id, lane)
 
     async def get_user(self, user_id: int, get_messages: bool = False, get_reps: bool = False):
         """Not excepting errors here as it would only be good for raising a different error."""
-        query = """SELECT * FROM users WHERE id = $1"""
-        record = await self.fetchrow(query, user_id)
-        if record is None:
-            # Post new user.
-            user = User(bot=self.bot, id=user_id, messages=[], reps=[])
-            await user.post()
-            return user
+        record = await self._upsert_user(user_id)
 
         if get_messages:
             messages = await self.get_messages(user_id)
@@ -61,54 +342,188 @@ class DataBase(object):
         else:
             reps = []
 
-        return User(bot=self.bot, messages=messages, reps=reps, **record)
+        user = User(messages=messages, reps=reps, **record)
+        self.counters.apply(user)
+        return user
 
-    async def get_all_users(self, get_messages: bool = False, get_reps: bool = False):
-        records = await self.fetch('SELECT * FROM users')
-        users = {int(record["id"]): User(bot=self.bot, messages=[], reps=[], **record) for record in records}
+    async def get_top_users(self, limit: int = 10) -> List[User]:
+        """Users with the most messages sent, including increments that haven't been flushed yet."""
+        records = await self.fetch('users.top', limit)
 
-        if get_messages:
-            records = await self.fetch('SELECT * FROM messages ORDER BY author_id ASC')
-            messages = [Message(bot=self.bot, **record) for record in records]
-            for message in messages:
-                users[message.author_id].messages.append(message)
+        pending = self.counters.pending_users()
+        if pending:
+            # Only users with pending increments can overtake the ones we already fetched.
+            records += await self.fetch('users.by_ids', pending)
 
-        if get_reps:
-            records = await self.fetch("SELECT * FROM reps ORDER BY user_id ASC")
-            reps = [Rep(bot=self.bot, **record) for record in records]
-            for rep in reps:
-                users[rep.user_id].reps.append(rep)
+        users = {}
+        for record in records:
+            if record['id'] not in users:
+                users[record['id']] = user = User(messages=[], reps=[], **record)
+                self.counters.apply(user)
+
+        return sorted(users.values(), key=lambda u: u.messages_sent, reverse=True)[:limit]
+
+    async def cursor(self, query: str, *args, prefetch: int = 1000, lane: str = BACKGROUND):
+        """Iterate the records of `query` through a server side cursor, `prefetch` rows at a time.
+        Holds a connection until the iteration ends, wrap it in `aclosing` when breaking out early."""
+        async with self.acquire(lane=lane) as con:
+            with self.metrics.measure(f'CURSOR {query}', args):
+                async with con.transaction():
+                    async for record in self._cursor(con, query, *args, prefetch=prefetch):
+                        yield record
+
+    def _cursor(self, con, query: str, *args, prefetch: int = 1000):
+        """An async iterable cursor on `con`, which has to be in a transaction"""
+        if query in self.queries:
+            async def iterate():
+                statement = await self.queries.statement(con, query)
+                async for record in statement.cursor(*args, prefetch=prefetch):
+                    yield record
+            return iterate()
+        return con.cursor(query, *args, prefetch=prefetch).__aiter__()
+
+    async def iter_all_users(self, get_messages: bool = False, get_reps: bool = False, *, prefetch: int = 1000):
+        """Yield every `User`, ordered by id, with their messages / reps attached.
+
+        Users, messages and reps are read through cursors ordered by user id and merged as we go,
+        so only one user and its rows are held in memory at a time."""
+        async with self.acquire(lane=BACKGROUND) as con:
+            with self.metrics.measure('CURSOR users.all', ()):
+                async with con.transaction():
+                    messages = self._cursor(con, 'messages.all', prefetch=prefetch) if get_messages else None
+                    reps = self._cursor(con, 'reps.all', prefetch=prefetch) if get_reps else None
+                    message = await _next(messages)
+                    rep = await _next(reps)
+
+                    async for record in self._cursor(con, 'users.all', prefetch=prefetch):
+                        user = User(messages=[], reps=[], **record)
+
+                        # Rows of ids without a users row are skipped.
+                        while message is not None and message['author_id'] <= user.id:
+                            if message['author_id'] == user.id:
+                                user.messages.append(Message(**message))
+                            message = await _next(messages)
+
+                        while rep is not None and rep['user_id'] <= user.id:
+                            if rep['user_id'] == user.id:
+                                user.reps.append(Rep(**rep))
+                            rep = await _next(reps)
+
+                        self.counters.apply(user)
+                        yield user
+
+    async def get_all_users(self, get_messages: bool = False, get_reps: bool = False):
+        return [user async for user in self.iter_all_users(get_messages=get_messages, get_reps=get_reps)]
 
-        return [x for x in list(users.values())]
+    async def iter_messages(self, author_id: int = None, *, prefetch: int = 1000):
+        """Yield every stored `Message`, or every message of `author_id`"""
+        if author_id is None:
+            cursor = self.cursor('messages.all', prefetch=prefetch)
+        else:
+            cursor = self.cursor('messages.by_author', author_id, prefetch=prefetch)
+        async for record in cursor:
+            yield Message(**record)
 
     async def get_messages(self, author_id: int) -> List[Message]:
-        query = """SELECT * FROM messages WHERE author_id = $1"""
-        records = await self.fetch(query, author_id)
-        return [Message(bot=self.bot, **record) for record in records]
+        records = await self.fetch('messages.by_author', author_id)
+        return [Message(**record) for record in records]
 
     async def get_message(self, message_id: int) -> Message:
-        query = """SELECT * FROM messages WHERE message_id = $1"""
-        record = await self.fetchrow(query, message_id)
-        return Message(bot=self.bot, **record)
+        record = await self.fetchrow('messages.get', message_id)
+        return Message(**record)
 
     async def get_reps(self, id: int, key: str = 'user_id'):
         if key not in ('author_id', 'user_id'):
             raise RuntimeWarning('get_reps `key` can only be `author_id` or `user_id`')
-        query = """SELECT * FROM reps WHERE {} = $1""".format(key)
-        records = await self.fetch(query, id)
-        return [Rep(bot=self.bot, **record) for record in records]
+        records = await self.fetch(f'reps.by_{key}', id)
+        return [Rep(**record) for record in records]
+
+    async def get_message_count(self, guild_id: int = None, *, estimate: bool = False) -> Optional[int]:
+        """Messages ever recorded for `guild_id`, or for all guilds, in constant time.
+        The counters are never decremented, purged and archived messages still count.
+
+        With `estimate` ( or if the counters are missing ) this uses the planners row estimate instead. That is
+        of the rows still in the messages table, so less than the counters once retention or archiving removed
+        some, and it only exists for the whole table: a guilds count is then None."""
+        if estimate and guild_id is not None:
+            raise ValueError('Only the total message count can be estimated')
+        if not estimate:
+            try:
+                if guild_id is None:
+                    count = await self.fetchval('message_counts.total')
+                else:
+                    count = await self.fetchval('message_counts.get', guild_id)
+                return (count or 0) + self.message_buffer.pending(guild_id)
+            except asyncpg.UndefinedTableError:
+                if guild_id is not None:
+                    return None
+        return max(await self.fetchval('messages.estimate') or 0, 0) + self.message_buffer.pending()
+
+    async def get_message_stats(self, author_id: int, guild_id: int = None) -> MessageStats:
+        """Count, first and last message of `author_id` ( in `guild_id` ) over the full history, archive included."""
+        record = await self.fetchrow('messages.author_stats', author_id, guild_id)
+        stored = MessageStats(count=record['count'], first=record['first'], last=record['last'])
+        return await self.archive.user_stats(author_id, guild_id) + stored
+
+    async def get_rep_summary(self, user_id: int, top: int = 10) -> RepSummary:
+        """Total reps, last rep and the `top` givers of `user_id` in one aggregate query."""
+        cached = self._rep_summaries.get(user_id)
+        if cached is not None and cached[0] == top:
+            return cached[1]
+
+        records = await self.fetch('reps.summary', user_id, top)
+        if records:
+            summary = RepSummary(total=int(records[0]['total']), last_rep=records[0]['last_rep'],
+                                 top_givers=[(record['author_id'], record['reps']) for record in records])
+        else:
+            summary = RepSummary(total=0, last_rep=None, top_givers=[])
+
+        self._rep_summaries.set(user_id, (top, summary))
+        return summary
+
+    def invalidate_rep_summary(self, user_id: int) -> None:
+        self._rep_summaries.pop(user_id)
+
+    async def get_rep_leaderboard(self, limit: int = 10):
+        """( user_id, reps ) of the `limit` most repped users"""
+        return await self.rep_leaderboard.top(limit)
 
     async def get_config(self, guild_id: int):
-        query = """SELECT * FROM gconfigs WHERE guild_id = $1"""
-        record = await self.fetchrow(query, guild_id)
+        record = await self.fetchrow('gconfigs.get', guild_id)
         if record is not None:
             return FilterConfig(bot=self.bot, **record)
         config = FilterConfig(bot=self.bot, guild_id=guild_id, blacklist_urls=[], whitelist_channels=[])
         return await config.post()
 
     async def get_tag(self, guild_id: int, name: str):
-        query = """SELECT * FROM tags WHERE guild_id = $1 AND name = $2"""
-        record = await self.fetchrow(query, guild_id, name)
-        if record is not None:
-            return Tag(bot=self.bot, **record)
-        return record
+        """Read-through cached, missing tags are cached as well.
+        `Tag` invalidates the cache on every write."""
+        cache = self._tag_cache.get(guild_id)
+        if cache is None:
+            cache = self._tag_cache[guild_id] = TTLCache(maxsize=256, ttl=600.0)
+
+        tag = cache.get(name, default=False)
+        if tag is not False:
+            return tag
+
+        generation = self._tag_generation.get(guild_id, 0)
+        record = await self.fetchrow('tags.get', guild_id, name)
+        tag = Tag(**record) if record is not None else None
+
+        if self._tag_generation.get(guild_id, 0) == generation:  # Don't cache a read that raced a write.
+            cache.set(name, tag)
+        return tag
+
+    def invalidate_tag(self, guild_id: int, *names: str) -> None:
+        self._tag_generation[guild_id] = self._tag_generation.get(guild_id, 0) + 1
+        cache = self._tag_cache.get(guild_id)
+        if cache is not None:
+            for name in names:
+                cache.pop(name)
+
+    def tag_cache_info(self) -> dict:
+        caches = self._tag_cache.values()
+        return {'guilds': len(caches),
+                'size': sum(len(c) for c in caches),
+                'hits': sum(c.hits for c in caches),
+                'misses': sum(c.misses for c in caches)}
@@ -0,0 +1,114 @@
+from typing import Dict
+from uuid import uuid4
+import asyncpg
+import asyncio
+
+from ..domains import is_domain
+from .gconfig import FilterConfig
+
+
+class FilterConfigs(object):
+    """Every guilds `FilterConfig`, shared by all bot processes.
+
+    All configs are loaded with one query on startup. Every write to gconfigs sends a notification on
+    the `gconfigs` channel, which all processes LISTEN to on a dedicated connection and answer by
+    re-reading that guilds config into the cached object. Notifications carry the `token` of the
+    process that sent them, so a process skips its own."""
+
+    channel = 'gconfigs'
+
+    def __init__(self, db, *, reconnect_delay: float = 5.0, check_interval: float = 30.0):
+        self.db = db
+        self.token = uuid4().hex
+        self.reconnect_delay = reconnect_delay
+        self.check_interval = check_interval
+        self._configs: Dict[int, FilterConfig] = {}
+        self._creating: Dict[int, asyncio.Task] = {}
+        self._task = None
+
+    def __len__(self):
+        return len(self._configs)
+
+    def __contains__(self, guild_id: int) -> bool:
+        return guild_id in self._configs
+
+    def cache_info(self) -> dict:
+        """The URL verdict caches of every guild combined"""
+        infos = [config.cache_info() for config in self._configs.values()]
+        return {key: sum(info[key] for info in infos) for key in ('size', 'hits', 'misses')}
+
+    async def load(self) -> None:
+        """(Re)load every config, updating the cached objects in place."""
+        for record in await self.db.fetch('gconfigs.all'):
+            self._set(record)
+
+    def _set(self, record) -> FilterConfig:
+        config = self._configs.get(record['guild_id'])
+        if config is None:
+            config = self._configs[record['guild_id']] = FilterConfig(bot=self.db.bot, **record)
+        else:
+            config.set(**record)
+        return config
+
+    async def get(self, guild_id: int) -> FilterConfig:
+        """The config of `guild_id`, created if the guild has none yet."""
+        config = self._configs.get(guild_id)
+        if config is not None:
+            return config
+
+        task = self._creating.get(guild_id)
+        if task is None:
+            task = self.db.bot.loop.create_task(self.db.get_config(guild_id))
+            task.add_done_callback(lambda _: self._creating.pop(guild_id, None))
+            self._creating[guild_id] = task
+
+        config = await asyncio.shield(task)
+        return self._configs.setdefault(guild_id, config)
+
+    async def refresh(self, guild_id: int) -> None:
+        record = await self.db.fetchrow('gconfigs.get', guild_id)
+        if record is not None:
+            self._set(record)
+
+    def _on_notification(self, con, pid: int, channel: str, payload: str) -> None:
+        token, _, guild_id = payload.partition(':')
+        if token != self.token:
+            self.db.bot.loop.create_task(self.refresh(int(guild_id)))
+
+    async def start(self) -> None:
+        await self.load()
+        for config in self._configs.values():
+            bare = [entry for entry in config.blacklist_urls if not is_domain(entry)]
+            if bare:
+                print(f'Blacklist entries of guild {config.guild_id} that are no domain, '
+                      f'they only match a host named exactly that: {bare}')
+        if self._task is None:
+            self._task = self.db.bot.loop.create_task(self._listen_loop())
+
+    async def _listen_loop(self):
+        while True:
+            con = None
+            try:
+                # LISTEN holds on to its connection, so it gets one of its own outside of the pool.
+                con = await asyncpg.connect(self.db.uri)
+                await con.add_listener(self.channel, self._on_notification)
+                await self.load()  # Catch up with whatever changed while we weren't listening.
+                while not con.is_closed():
+                    await asyncio.sleep(self.check_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f'Lost the {self.channel} listener connection: {e!r}')
+            finally:
+                if con is not None and not con.is_closed():
+                    await con.close()
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
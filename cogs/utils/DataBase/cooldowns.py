@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+import asyncio
+import weakref
+
+
+class RepCooldowns(object):
+    """author_id -> time of their latest rep, for every author that repped within `window`.
+
+    Warmed with one query on startup and updated by `Rep.post`, so an author still on cooldown
+    is answered without touching the database. An author missing from the index is not
+    trusted blindly, the insert itself re-checks the window in SQL."""
+
+    def __init__(self, db, *, window: timedelta = timedelta(days=1)):
+        self.db = db
+        self.window = window
+        self._last_rep: Dict[int, datetime] = {}
+        self._locks = weakref.WeakValueDictionary()  # author_id -> asyncio.Lock, while in use.
+
+    def __len__(self):
+        return len(self._last_rep)
+
+    async def load(self) -> None:
+        records = await self.db.fetch('reps.latest_per_author', datetime.utcnow() - self.window)
+        self._last_rep = {record['author_id']: record['repped_at'] for record in records}
+
+    def on_cooldown(self, author_id: int) -> Optional[datetime]:
+        """The time of `author_id`s last rep if it is still within the window"""
+        repped_at = self._last_rep.get(author_id)
+        if repped_at is None:
+            return None
+        if repped_at + self.window > datetime.utcnow():
+            return repped_at
+        del self._last_rep[author_id]
+        return None
+
+    def set(self, author_id: int, repped_at: datetime) -> None:
+        last = self._last_rep.get(author_id)
+        if last is None or repped_at > last:
+            self._last_rep[author_id] = repped_at
+
+    def lock(self, author_id: int) -> asyncio.Lock:
+        """Serializes reps from the same author within this process."""
+        lock = self._locks.get(author_id)
+        if lock is None:
+            lock = self._locks[author_id] = asyncio.Lock()
+        return lock
@@ -0,0 +1,170 @@
+from collections import defaultdict
+from typing import Dict, List, Tuple
+import asyncio
+
+from .admission import AdmissionRejected, BACKGROUND
+
+
+class PeriodicFlush(object):
+    """Base for in-memory accumulators that are written to the database every `flush_interval` seconds."""
+
+    def __init__(self, db, *, flush_interval: float):
+        self.db = db
+        self.flush_interval = flush_interval
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = self.db.bot.loop.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except AdmissionRejected:
+                pass  # The pool is busy with commands, whatever is pending is retried next time.
+            except Exception as e:
+                print(f'Failed to flush {type(self).__name__} ( {len(self)} pending ): {e!r}')
+
+    async def flush(self) -> int:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        """Stop the flush loop and write whatever is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+class UserCounters(PeriodicFlush):
+    """Coalesces `users.messages_sent` and `users.commands_used` increments.
+
+    Increments are summed per user in memory and written with a single UPDATE every `flush_interval` seconds.
+    Anything reading these columns should add `pending()` so counts stay exact between flushes."""
+
+    def __init__(self, db, *, flush_interval: float = 10.0):
+        super().__init__(db, flush_interval=flush_interval)
+        self._messages: Dict[int, int] = defaultdict(int)
+        self._commands: Dict[int, int] = defaultdict(int)
+        self._in_flight: (Dict[int, int], Dict[int, int]) = ({}, {})  # Being written by `flush`.
+
+    def __len__(self):
+        return len(self._messages.keys() | self._commands.keys())
+
+    def add_message(self, user_id: int, amount: int = 1) -> None:
+        self._messages[user_id] += amount
+
+    def add_command(self, user_id: int, amount: int = 1) -> None:
+        self._commands[user_id] += amount
+
+    def pending(self, user_id: int) -> (int, int):
+        """Unflushed ( messages_sent, commands_used ) for `user_id`"""
+        messages, commands = self._in_flight
+        return (self._messages.get(user_id, 0) + messages.get(user_id, 0),
+                self._commands.get(user_id, 0) + commands.get(user_id, 0))
+
+    def pending_users(self) -> List[int]:
+        messages, commands = self._in_flight
+        return list(self._messages.keys() | self._commands.keys() | messages.keys() | commands.keys())
+
+    def apply(self, user) -> None:
+        """Add the unflushed counts to `user`"""
+        messages, commands = self.pending(user.id)
+        user.messages_sent += messages
+        user.commands_used += commands
+
+    async def flush(self) -> int:
+        """Write all pending increments, returns the amount of users updated."""
+        async with self._flush_lock:
+            messages, self._messages = self._messages, defaultdict(int)
+            commands, self._commands = self._commands, defaultdict(int)
+
+            ids = sorted(messages.keys() | commands.keys())  # Rows locked in the same order by every process.
+            if not ids:
+                return 0
+
+            self._in_flight = (messages, commands)
+            try:
+                await self.db.execute('users.add_counts', ids,
+                                      [messages.get(id, 0) for id in ids],
+                                      [commands.get(id, 0) for id in ids], lane=BACKGROUND)
+            except Exception:
+                # Put the deltas back so they are retried with the next flush.
+                for id, amount in messages.items():
+                    self._messages[id] += amount
+                for id, amount in commands.items():
+                    self._commands[id] += amount
+                raise
+            finally:
+                self._in_flight = ({}, {})
+            return len(ids)
+
+
+class TagUses(PeriodicFlush):
+    """Coalesces `tags.uses` increments per ( guild_id, name ).
+
+    `Tag.rename` and `Tag.delete` go through `renamed` / `deleted` while holding `lock`,
+    so pending uses follow the tag and never get written under a stale name."""
+
+    def __init__(self, db, *, flush_interval: float = 30.0):
+        super().__init__(db, flush_interval=flush_interval)
+        self._uses: Dict[Tuple[int, str], int] = defaultdict(int)
+        self._in_flight: Dict[Tuple[int, str], int] = {}
+
+    def __len__(self):
+        return len(self._uses)
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        """Held while flushing, hold it around writes that change a tags identity."""
+        return self._flush_lock
+
+    def add(self, guild_id: int, name: str, amount: int = 1) -> None:
+        self._uses[(guild_id, name)] += amount
+
+    def pending(self, guild_id: int, name: str) -> int:
+        key = (guild_id, name)
+        return self._uses.get(key, 0) + self._in_flight.get(key, 0)
+
+    def renamed(self, guild_id: int, name: str, new_name: str) -> None:
+        uses = self._uses.pop((guild_id, name), 0)
+        if uses:
+            self._uses[(guild_id, new_name)] += uses
+
+    def deleted(self, guild_id: int, name: str) -> None:
+        self._uses.pop((guild_id, name), None)
+
+    async def flush(self) -> int:
+        """Write all pending uses, returns the amount of tags updated."""
+        async with self._flush_lock:
+            uses, self._uses = self._uses, defaultdict(int)
+            if not uses:
+                return 0
+
+            keys = list(uses.keys())
+            self._in_flight = uses
+            try:
+                await self.db.execute('tags.add_uses',
+                                      [guild_id for guild_id, _ in keys],
+                                      [name for _, name in keys],
+                                      [uses[key] for key in keys], lane=BACKGROUND)
+            except Exception:
+                for key, amount in uses.items():
+                    self._uses[key] += amount
+                raise
+            finally:
+                self._in_flight = {}
+
+            # Cached tags hold the uses they were read with.
+            for guild_id, name in keys:
+                self.db.invalidate_tag(guild_id, name)
+            return len(keys)
@@ -1,32 +1,80 @@
-from typing import List, Union
+from typing import List, Optional, Union
 from asyncio import Lock
 from json import dumps, loads
 
+from ..domains import DomainTrie
+from .cache import LRUCache
+
 
 class FilterConfig(object):
     def __init__(self, bot, guild_id: int, blacklist_urls: List[str],
                  whitelist_channels: List[int], reasons: dict = None, enabled: bool = True):
         self.bot = bot
+        self.update_lock = Lock(loop=self.bot.loop)
+        self.generation = 0  # Bumped whenever the settings change, verdicts of older generations are stale.
+        self._verdicts = LRUCache(maxsize=512)  # netloc -> blacklist entry or None
+        self._verdicts_generation = 0
+        self.set(guild_id, blacklist_urls, whitelist_channels, reasons, enabled)
+
+    def set(self, guild_id: int, blacklist_urls: List[str],
+            whitelist_channels: List[int], reasons: dict = None, enabled: bool = True) -> None:
+        """Replace the settings in place, for when another process changed them"""
         self.guild_id = guild_id
         self.blacklist_urls = blacklist_urls
         self.whitelist_channels = whitelist_channels
         self.reasons = loads(reasons) if reasons is not None else {}
         self.enabled = enabled
-        self.update_lock = Lock(loop=self.bot.loop)
+        self._blacklist = None
+        self._blacklist_urls = ()
+        self._whitelist = None
+        self.generation += 1
+
+    @property
+    def blacklist(self) -> DomainTrie:
+        """`blacklist_urls` compiled for lookups, rebuilt after `update` or `set` changed them"""
+        if self._blacklist is None:
+            self._blacklist = DomainTrie(self.blacklist_urls)
+            self._blacklist_urls = tuple(self.blacklist_urls)
+        return self._blacklist
+
+    @property
+    def whitelist(self) -> frozenset:
+        """`whitelist_channels` as a set, rebuilt after `update` or `set`"""
+        if self._whitelist is None:
+            self._whitelist = frozenset(self.whitelist_channels)
+        return self._whitelist
+
+    def check(self, netloc: str) -> Optional[str]:
+        """The blacklist entry `netloc` falls under, cached per netloc until the settings change"""
+        if self._verdicts_generation != self.generation:
+            self._verdicts.clear()
+            self._verdicts_generation = self.generation
+
+        netloc = netloc.lower()
+        verdict = self._verdicts.get(netloc, default=False)
+        if verdict is False:
+            verdict = self.blacklist.match(netloc)
+            self._verdicts.set(netloc, verdict)
+        return verdict
+
+    def cache_info(self) -> dict:
+        return {'size': len(self._verdicts), 'hits': self._verdicts.hits, 'misses': self._verdicts.misses}
 
     async def post(self):
-        query = """INSERT INTO gconfigs ( guild_id, blacklist_urls, whitelist_channels, reasons )
-                   VALUES ( $1, $2, $3, $4 )"""
-        await self.bot.db.execute(query, self.guild_id, self.blacklist_urls,
-                                  self.whitelist_channels, dumps(self.reasons))
+        await self.bot.db.execute('gconfigs.insert', self.guild_id, self.blacklist_urls,
+                                  self.whitelist_channels, dumps(self.reasons), self.bot.db.filter_configs.token)
         return self
 
     async def update(self) -> None:
+        """Write the settings, every other process is notified to re-read them"""
         async with self.update_lock:
-            query = """UPDATE gconfigs SET blacklist_urls = $1, whitelist_channels = $2, enabled = $3, reasons = $4
-                       WHERE guild_id = $5"""
-            await self.bot.db.execute(query, self.blacklist_urls, self.whitelist_channels,
-                                      self.enabled, dumps(self.reasons), self.guild_id)
+            if self._blacklist is not None and tuple(self.blacklist_urls) != self._blacklist_urls:
+                self._blacklist = None
+            self._whitelist = None
+            self.generation += 1
+            await self.bot.db.execute('gconfigs.update', self.blacklist_urls, self.whitelist_channels,
+                                      self.enabled, dumps(self.reasons), self.guild_id,
+                                      self.bot.db.filter_configs.token)
 
     async def toggle(self) -> None:
         """Toggle this instance of FilterConfig"""
@@ -35,6 +83,7 @@ class FilterConfig(object):
                 self.enabled = False
             else:
                 self.enabled = True
+            self.generation += 1
         await self.update()
 
     def has_reason(self, key: str) -> Union[str, None]:
@@ -0,0 +1,74 @@
+from collections import defaultdict
+from heapq import nlargest
+from operator import itemgetter
+from time import monotonic
+from typing import Dict, List, Tuple
+import asyncio
+
+
+class RepLeaderboard(object):
+    """In-memory top `size` of users by received reps.
+
+    Loaded with one aggregate query and kept up to date by `Rep.post` through `add`.
+    Users outside the loaded top can only be bounded, so the board reloads itself
+    once one of them could have caught up with the requested top. Reps of other processes, or removed ones,
+    are only seen by a load, so it is also reloaded `ttl` seconds after the last one."""
+
+    def __init__(self, db, *, size: int = 50, ttl: float = 600.0):
+        self.db = db
+        self.size = size
+        self.ttl = ttl
+        self._loaded_at = 0.0
+        self._counts: Dict[int, int] = None  # Exact counts of the tracked users.
+        self._floor = 0  # No untracked user had more reps than this when we loaded.
+        self._untracked: Dict[int, int] = defaultdict(int)  # Reps untracked users received since then.
+        self._generation = 0  # Bumped by every `add`.
+        self._raced = False  # A rep was added while loading, it may or may not be in what we loaded.
+        self._lock = asyncio.Lock()
+
+    def add(self, user_id: int, amount: int = 1) -> None:
+        self._generation += 1
+        if self._counts is None:
+            return
+        if user_id in self._counts or self._floor == 0:
+            # With a floor of 0 every user that has reps is tracked.
+            self._counts[user_id] = self._counts.get(user_id, 0) + amount
+        else:
+            self._untracked[user_id] += amount
+
+    def invalidate(self) -> None:
+        self._counts = None
+
+    async def _load(self) -> None:
+        generation = self._generation
+        records = await self.db.fetch('reps.leaderboard', self.size)
+        self._raced = self._generation != generation
+        self._loaded_at = monotonic()
+        self._counts = {record['user_id']: record['reps'] for record in records}
+        self._floor = records[-1]['reps'] if len(records) == self.size else 0
+        self._untracked = defaultdict(int)
+
+    def _is_exact(self, limit: int) -> bool:
+        if self._counts is None or self._raced or limit > self.size:
+            return False
+        if monotonic() - self._loaded_at >= self.ttl:
+            return False
+        if not self._untracked:
+            return True
+        top = nlargest(limit, self._counts.values())
+        lowest = top[-1] if len(top) == limit else 0
+        return lowest >= self._floor + max(self._untracked.values())
+
+    async def top(self, limit: int = 10) -> List[Tuple[int, int]]:
+        """( user_id, reps ) of the `limit` most repped users, most reps first."""
+        if not self._is_exact(limit):
+            async with self._lock:
+                # Reps are rare, so a load that raced one is simply done again. If it keeps racing we answer
+                # with what we have, it stays inexact and the next call loads again.
+                for _ in range(3):
+                    if self._is_exact(limit):
+                        break
+                    if limit > self.size:
+                        self.size = limit
+                    await self._load()
+        return nlargest(limit, self._counts.items(), key=itemgetter(1))
@@ -2,15 +2,19 @@ from datetime import datetime
 
 from discord import Guild, TextChannel, Message as Discord_Message
 
+from .admission import AdmissionRejected, BACKGROUND
+from .record import Record
+
 
 class CouldNotFind(Exception):
     """Raised when `Message.get_real()` doesnt find `x`"""
 
 
-class Message(object):
-    def __init__(self, bot, created_at: datetime, content: str,
+class Message(Record):
+    __slots__ = ('created_at', 'content', 'message_id', 'channel_id', 'guild_id', 'author_id')
+
+    def __init__(self, created_at: datetime, content: str,
                  message_id: int, channel_id: int, guild_id: int, author_id: int):
-        self.bot = bot
         self.created_at = created_at
         self.content = content
         self.message_id = message_id
@@ -22,11 +26,11 @@ class Message(object):
         """We shouldn't have to check for duplicate messages here ->
         Unless someone mis-uses this.
         If a conflict somehow still occurs nothing will happen. ( hopefully :shrug: )"""
-        query = """INSERT INTO messages ( message_id, guild_id, channel_id, author_id, content, created_at )
-                   VALUES ( $1, $2, $3, $4, $5, $6 )
-                   ON CONFLICT DO NOTHING"""
-        await self.bot.db.execute(query, self.message_id, self.guild_id, self.channel_id, self.author_id,
-                                  self.content, self.created_at)
+        await self.db.execute('messages.insert', *self.as_record())
+
+    def as_record(self) -> tuple:
+        """Row values in the column order of the `messages.insert` query"""
+        return self.message_id, self.guild_id, self.channel_id, self.author_id, self.content, self.created_at
 
     async def get_real(self) -> Discord_Message:
         """Get the "real" message object
@@ -47,9 +51,13 @@ class Message(object):
 
     @classmethod
     async def on_message(cls, bot, message: Discord_Message) -> None:
-        user = await bot.db.get_user(message.author.id)  # Assure that everyone gets a user row
-        self = cls(bot=bot, content=message.content, created_at=message.created_at,
+        try:
+            # Assure that everyone gets a user row, without competing with commands for connections.
+            await bot.db.ensure_user(message.author.id, lane=BACKGROUND)
+        except AdmissionRejected:
+            pass  # Tried again with their next message, the counter flush creates the row meanwhile.
+        self = cls(content=message.content, created_at=message.created_at,
                    message_id=message.id, guild_id=message.guild.id,
                    channel_id=message.channel.id, author_id=message.author.id)
-        await self.post()
-        await bot.db.execute('UPDATE users SET messages_sent = messages_sent + 1 WHERE id = $1', user.id)
+        await bot.db.message_buffer.put(self)  # Written in bulk, see `MessageBuffer`
+        bot.db.counters.add_message(message.author.id)
@@ -0,0 +1,250 @@
+from typing import List, NamedTuple, Tuple
+import re
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    statements: Tuple[str, ...]
+    transaction: bool = True  # CREATE INDEX CONCURRENTLY can't run inside one.
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, 'Base schema', (
+        """CREATE TABLE IF NOT EXISTS users (
+               id BIGINT PRIMARY KEY,
+               commands_used INTEGER NOT NULL DEFAULT 0,
+               joined_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+               messages_sent INTEGER NOT NULL DEFAULT 0
+           )""",
+        """CREATE TABLE IF NOT EXISTS messages (
+               message_id BIGINT PRIMARY KEY,
+               guild_id BIGINT NOT NULL,
+               channel_id BIGINT NOT NULL,
+               author_id BIGINT NOT NULL,
+               content TEXT,
+               created_at TIMESTAMP NOT NULL
+           )""",
+        """CREATE TABLE IF NOT EXISTS reps (
+               rep_id BIGINT PRIMARY KEY,
+               user_id BIGINT NOT NULL,
+               author_id BIGINT NOT NULL,
+               repped_at TIMESTAMP NOT NULL,
+               extra_info JSON
+           )""",
+        """CREATE TABLE IF NOT EXISTS tags (
+               guild_id BIGINT NOT NULL,
+               creator_id BIGINT NOT NULL,
+               text TEXT NOT NULL,
+               name TEXT NOT NULL,
+               uses INTEGER NOT NULL DEFAULT 0,
+               created_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+           )""",
+        """CREATE TABLE IF NOT EXISTS gconfigs (
+               guild_id BIGINT PRIMARY KEY,
+               blacklist_urls TEXT[] NOT NULL DEFAULT '{}',
+               whitelist_channels BIGINT[] NOT NULL DEFAULT '{}',
+               reasons TEXT,
+               enabled BOOLEAN NOT NULL DEFAULT TRUE
+           )""",
+        """CREATE TABLE IF NOT EXISTS message_counts (
+               guild_id BIGINT PRIMARY KEY,
+               count BIGINT NOT NULL DEFAULT 0
+           )""",
+        # Seeded once, from then on the message buffer keeps it up to date.
+        """INSERT INTO message_counts ( guild_id, count )
+           SELECT guild_id, COUNT(*) FROM messages GROUP BY guild_id
+           ON CONFLICT DO NOTHING""",
+    )),
+    Migration(2, 'Hot path indexes', (
+        # Rep.post cooldown check and the cooldown warm up
+        """CREATE INDEX CONCURRENTLY IF NOT EXISTS reps_author_id_repped_at_idx
+           ON reps ( author_id, repped_at DESC )""",
+        """CREATE INDEX CONCURRENTLY IF NOT EXISTS reps_repped_at_idx ON reps ( repped_at )""",
+        # get_rep_summary and get_reps, covering so the summary never touches the heap
+        """CREATE INDEX CONCURRENTLY IF NOT EXISTS reps_user_id_author_id_idx
+           ON reps ( user_id, author_id, repped_at )""",
+        # get_top_users / scoreboard
+        """CREATE INDEX CONCURRENTLY IF NOT EXISTS users_messages_sent_idx ON users ( messages_sent DESC )""",
+        # get_tag and every tag write
+        """CREATE INDEX CONCURRENTLY IF NOT EXISTS tags_guild_id_name_idx ON tags ( guild_id, name )""",
+        # tag list
+        """CREATE INDEX CONCURRENTLY IF NOT EXISTS tags_guild_id_creator_id_idx
+           ON tags ( guild_id, creator_id, name )""",
+    ), transaction=False),
+    Migration(3, 'Trigram index for tag search', (
+        """CREATE EXTENSION IF NOT EXISTS pg_trgm""",
+        """CREATE INDEX IF NOT EXISTS tags_name_trgm_idx ON tags USING gin ( name gin_trgm_ops )""",
+    )),
+    # Everything attaching the existing table as a partition would otherwise do while holding ACCESS EXCLUSIVE
+    # on it, done up front without blocking writes: the check proves the NOT NULLs and the partition bound,
+    # so neither gets checked with a table scan, and the indexes of the partitioned table are built already.
+    Migration(4, 'Prepare messages for partitioning', (
+        """DO $$
+           BEGIN
+               IF NOT EXISTS ( SELECT 1 FROM pg_constraint WHERE conname = 'messages_partition_check' ) THEN
+                   EXECUTE format('ALTER TABLE messages ADD CONSTRAINT messages_partition_check
+                                   CHECK ( guild_id IS NOT NULL AND channel_id IS NOT NULL AND author_id IS NOT NULL
+                                           AND created_at IS NOT NULL AND created_at < %L ) NOT VALID',
+                                  date_trunc('month', now() AT TIME ZONE 'utc') + INTERVAL '1 month');
+               END IF;
+           END $$""",
+        """ALTER TABLE messages VALIDATE CONSTRAINT messages_partition_check""",
+        """CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS messages_legacy_message_id_created_at_idx
+           ON messages ( message_id, created_at )""",
+        # get_messages / per author history
+        """CREATE INDEX CONCURRENTLY IF NOT EXISTS messages_legacy_author_id_created_at_idx
+           ON messages ( author_id, created_at )""",
+        # Picked up by migration 6.
+        """CREATE INDEX CONCURRENTLY IF NOT EXISTS messages_legacy_created_at_idx ON messages ( created_at )""",
+    ), transaction=False),
+    # The existing table becomes the partition for everything up to the end of this month,
+    # MessagePartitions creates the monthly partitions after it and purges old ones.
+    Migration(5, 'Partition messages by created_at', (
+        """ALTER TABLE messages RENAME TO messages_legacy""",
+        # A partition needs a constraint backing the primary key of the parent, not just an index.
+        """ALTER TABLE messages_legacy DROP CONSTRAINT IF EXISTS messages_pkey""",
+        # A partition has to have every NOT NULL of the parent, messages_partition_check spares the scan.
+        """ALTER TABLE messages_legacy ALTER COLUMN guild_id SET NOT NULL,
+                                      ALTER COLUMN channel_id SET NOT NULL,
+                                      ALTER COLUMN author_id SET NOT NULL,
+                                      ALTER COLUMN created_at SET NOT NULL""",
+        """ALTER TABLE messages_legacy ADD CONSTRAINT messages_legacy_pkey
+           PRIMARY KEY USING INDEX messages_legacy_message_id_created_at_idx""",
+        """CREATE TABLE messages (
+               message_id BIGINT NOT NULL,
+               guild_id BIGINT NOT NULL,
+               channel_id BIGINT NOT NULL,
+               author_id BIGINT NOT NULL,
+               content TEXT,
+               created_at TIMESTAMP NOT NULL,
+               PRIMARY KEY ( message_id, created_at )
+           ) PARTITION BY RANGE ( created_at )""",
+        """CREATE INDEX messages_author_id_created_at_idx ON messages ( author_id, created_at )""",
+        """CREATE TABLE messages_default PARTITION OF messages DEFAULT""",
+        # Attaches the existing indexes and, as messages_partition_check implies the bound, skips validation.
+        """ALTER TABLE messages ATTACH PARTITION messages_legacy
+           FOR VALUES FROM ( MINVALUE ) TO ( date_trunc('month', now() AT TIME ZONE 'utc') + INTERVAL '1 month' )""",
+        # The bound may lie past the check if the month changed since migration 4, the bound is what counts now.
+        """ALTER TABLE messages_legacy DROP CONSTRAINT messages_partition_check""",
+    )),
+    # MessageArchive reads whole months and the retention job deletes by age.
+    Migration(6, 'Index messages by created_at', (
+        """CREATE INDEX IF NOT EXISTS messages_created_at_idx ON messages ( created_at )""",
+    )),
+    Migration(7, 'Docs projects registry', (
+        """CREATE TABLE IF NOT EXISTS docs_projects (
+            key TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            added_by BIGINT,
+            added_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+        )""",
+        """INSERT INTO docs_projects ( key, url ) VALUES
+            ( 'latest', 'https://discordpy.readthedocs.io/en/latest' ),
+            ( 'python', 'https://docs.python.org/3' ),
+            ( 'pygame', 'https://www.pygame.org/docs' ),
+            ( 'aiohttp', 'https://docs.aiohttp.org/en/stable' )
+        ON CONFLICT DO NOTHING""",
+    )),
+]
+
+# ( table, leading columns ) an index has to start with for the hot queries to stay fast.
+EXPECTED_INDEXES = [
+    ('messages', ('author_id',)),
+    ('messages', ('created_at',)),
+    ('reps', ('author_id', 'repped_at')),
+    ('reps', ('repped_at',)),
+    ('reps', ('user_id', 'author_id')),
+    ('users', ('messages_sent',)),
+    ('tags', ('guild_id', 'name')),
+    ('tags', ('guild_id', 'creator_id')),
+]
+
+# The name of the index a CREATE INDEX CONCURRENTLY statement builds.
+CONCURRENT_INDEX_RE = re.compile(r'CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)',
+                                 flags=re.IGNORECASE)
+
+# Any advisory lock key works, as long as every process uses the same one.
+LOCK_KEY = 739205949134471238
+
+
+async def migrate(db, migrations: List[Migration] = None) -> List[int]:
+    """Apply every migration newer than the databases schema version, returns the versions applied.
+
+    Holds an advisory lock while doing so, so that only one process migrates at a time."""
+    migrations = sorted(migrations or MIGRATIONS, key=lambda m: m.version)
+    applied = []
+
+    async with db.acquire() as con:
+        await con.execute("""SELECT pg_advisory_lock($1)""", LOCK_KEY)
+        try:
+            await con.execute("""CREATE TABLE IF NOT EXISTS schema_migrations (
+                                     version INTEGER PRIMARY KEY,
+                                     description TEXT NOT NULL,
+                                     applied_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+                                 )""")
+            current = await con.fetchval("""SELECT COALESCE(MAX(version), 0) FROM schema_migrations""")
+
+            for migration in migrations:
+                if migration.version <= current:
+                    continue
+
+                print(f'Applying migration {migration.version}: {migration.description}')
+                if migration.transaction:
+                    async with con.transaction():
+                        for statement in migration.statements:
+                            await con.execute(statement)
+                        await _mark_applied(con, migration)
+                else:
+                    # Every statement has to be idempotent, we may be re-running a partially applied migration.
+                    for statement in migration.statements:
+                        await _drop_invalid_index(con, statement)
+                        await con.execute(statement)
+                    await _mark_applied(con, migration)
+                applied.append(migration.version)
+        finally:
+            await con.execute("""SELECT pg_advisory_unlock($1)""", LOCK_KEY)
+
+    return applied
+
+
+async def _mark_applied(con, migration: Migration) -> None:
+    await con.execute("""INSERT INTO schema_migrations ( version, description ) VALUES ( $1, $2 )""",
+                      migration.version, migration.description)
+
+
+async def _drop_invalid_index(con, statement: str) -> None:
+    """Drop what a failed or interrupted CREATE INDEX CONCURRENTLY left behind.
+
+    Postgres keeps such an index around as INVALID, IF NOT EXISTS would then skip it and it never gets built."""
+    match = CONCURRENT_INDEX_RE.match(statement.strip())
+    if match is None:
+        return
+    name = match.group(1)
+    invalid = await con.fetchval("""SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass($1)""", name)
+    if invalid:
+        print(f'Dropping invalid index {name} to build it again')
+        await con.execute(f"""DROP INDEX CONCURRENTLY IF EXISTS {name}""")
+
+
+async def missing_indexes(db) -> List[str]:
+    """Descriptions of the `EXPECTED_INDEXES` that no index covers, and of a missing trigram index on tags."""
+    query = """SELECT t.relname AS table_name,
+                      array_agg(a.attname::text ORDER BY k.n) AS columns,
+                      pg_get_indexdef(i.indexrelid) AS definition
+               FROM pg_index i
+               JOIN pg_class t ON t.oid = i.indrelid
+               JOIN LATERAL unnest(i.indkey) WITH ORDINALITY AS k ( attnum, n ) ON TRUE
+               JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+               WHERE t.relname = ANY($1::text[]) AND i.indisvalid
+               GROUP BY i.indexrelid, t.relname"""
+    records = await db.fetch(query, list({table for table, _ in EXPECTED_INDEXES}))
+
+    missing = []
+    for table, columns in EXPECTED_INDEXES:
+        if not any(r['table_name'] == table and tuple(r['columns'][:len(columns)]) == columns for r in records):
+            missing.append(f'{table} ( {", ".join(columns)} )')
+
+    if not any(r['table_name'] == 'tags' and 'gin_trgm_ops' in r['definition'] for r in records):
+        missing.append('tags USING gin ( name gin_trgm_ops )')
+    return missing
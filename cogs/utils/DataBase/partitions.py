@@ -0,0 +1,161 @@
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+import asyncpg
+import asyncio
+import re
+
+from .admission import AdmissionRejected, BACKGROUND
+
+
+def month_start(dt: datetime) -> datetime:
+    return datetime(dt.year, dt.month, 1)
+
+
+def next_month(dt: datetime) -> datetime:
+    return datetime(dt.year + dt.month // 12, dt.month % 12 + 1, 1)
+
+
+class MessagePartitions(object):
+    """Keeps the range partitioned `messages` table in shape.
+
+    Every `interval` seconds monthly partitions are created `months_ahead` months in advance.
+    If a `retention` is set rows older than it are removed as well: partitions that lie entirely
+    before the cutoff are detached ( and dropped unless `keep_detached` ), while partitions the cutoff
+    falls into are deleted from in chunks of `chunk_size` rows, each chunk its own short statement.
+
+    `message_counts` is left alone, it counts every message ever sent and not what is still stored."""
+
+    _bound = re.compile(r"FROM \((?:'([^']+)'|MINVALUE)\) TO \((?:'([^']+)'|MAXVALUE)\)")
+
+    def __init__(self, db, *, retention: timedelta = None, months_ahead: int = 2, chunk_size: int = 5000,
+                 chunk_pause: float = 0.5, keep_detached: bool = False, lock_timeout: float = 5.0,
+                 interval: float = 6 * 3600):
+        self.db = db
+        self.retention = retention
+        self.months_ahead = months_ahead
+        self.chunk_size = chunk_size
+        self.chunk_pause = chunk_pause
+        self.keep_detached = keep_detached
+        self.lock_timeout = lock_timeout
+        self.interval = interval
+        self._task = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = self.db.bot.loop.create_task(self._maintain_loop())
+
+    async def _maintain_loop(self):
+        while True:
+            try:
+                await self.maintain()
+            except asyncio.CancelledError:
+                raise
+            except AdmissionRejected:
+                pass  # Busy with commands, try again next time.
+            except Exception as e:
+                print(f'Failed to maintain the messages partitions: {e!r}')
+            await asyncio.sleep(self.interval)
+
+    async def maintain(self) -> None:
+        created = await self.create_partitions()
+        if created:
+            print(f'Created messages partitions {", ".join(created)}')
+
+        if self.retention is not None:
+            detached, deleted = await self.purge(datetime.utcnow() - self.retention)
+            if detached or deleted:
+                print(f'Purged messages: {len(detached)} partitions {"detached" if self.keep_detached else "dropped"}, '
+                      f'{deleted} rows deleted')
+
+    async def partitions(self) -> List[Tuple[str, Optional[datetime], Optional[datetime]]]:
+        """( name, lower bound, upper bound ) of every partition, unbounded ends and the default partition are None."""
+        partitions = []
+        for record in await self.db.fetch('messages.partitions', lane=BACKGROUND):
+            match = self._bound.search(record['bound'])
+            if match is None:  # DEFAULT
+                partitions.append((record['name'], None, None))
+                continue
+            lower, upper = (datetime.fromisoformat(b) if b is not None else None for b in match.groups())
+            partitions.append((record['name'], lower, upper))
+        return partitions
+
+    async def create_partitions(self, now: datetime = None) -> List[str]:
+        """Create the monthly partitions for this month and `months_ahead` months after it, returns their names."""
+        # Bounds of every partition but the default one, messages_legacy covers everything up to some month.
+        ranges = [(lower, upper) for name, lower, upper in await self.partitions() if name != 'messages_default']
+        start = month_start(now or datetime.utcnow())
+        created = []
+
+        async with self.db.acquire(lane=BACKGROUND) as con:
+            for _ in range(self.months_ahead + 1):
+                end = next_month(start)
+                name = f'messages_y{start.year}m{start.month:02}'
+                covered = any((lower is None or lower < end) and (upper is None or upper > start)
+                              for lower, upper in ranges)
+                if not covered:
+                    try:
+                        async with con.transaction():
+                            await con.execute(f"""CREATE TABLE {name} ( LIKE messages INCLUDING DEFAULTS )""")
+                            # Rows that landed in the default partition for want of this one move over with it,
+                            # otherwise attaching it would fail.
+                            await con.execute(f"""WITH moved AS (
+                                                      DELETE FROM messages_default
+                                                      WHERE created_at >= $1 AND created_at < $2
+                                                      RETURNING *
+                                                  )
+                                                  INSERT INTO {name} SELECT * FROM moved""", start, end)
+                            await con.execute(f"""ALTER TABLE messages ATTACH PARTITION {name}
+                                                  FOR VALUES FROM ( '{start}' ) TO ( '{end}' )""")
+                        created.append(name)
+                    except asyncpg.InvalidObjectDefinitionError:
+                        pass  # Another process attached an overlapping partition in the meantime.
+                start = end
+        return created
+
+    async def purge(self, cutoff: datetime) -> Tuple[List[str], int]:
+        """Remove every message created before `cutoff`, returns the detached partitions and the deleted row count."""
+        detached, deleted = [], 0
+        for name, lower, upper in await self.partitions():
+            if upper is not None and upper <= cutoff:
+                if await self._detach(name):
+                    detached.append(name)
+            elif lower is None or lower < cutoff:
+                deleted += await self._delete_before(name, cutoff)
+        return detached, deleted
+
+    async def _detach(self, name: str) -> bool:
+        """Detach ( and drop ) partition `name`, gives up instead of queueing behind long running queries."""
+        async with self.db.acquire(lane=BACKGROUND) as con:
+            try:
+                async with con.transaction():
+                    # DETACH CONCURRENTLY isn't allowed next to a default partition, so we take the short
+                    # exclusive lock instead, but never wait long enough for it to stall writes behind us.
+                    await con.execute(f"""SET LOCAL lock_timeout = '{int(self.lock_timeout * 1000)}ms'""")
+                    await con.execute(f"""ALTER TABLE messages DETACH PARTITION {name}""")
+                    if not self.keep_detached:
+                        await con.execute(f"""DROP TABLE {name}""")
+            except asyncpg.LockNotAvailableError:
+                return False  # Retried with the next run.
+        return True
+
+    async def _delete_before(self, name: str, cutoff: datetime) -> int:
+        """Delete rows of partition `name` created before `cutoff`, `chunk_size` rows at a time."""
+        deleted = 0
+        while True:
+            status = await self.db.execute(f"""DELETE FROM {name} WHERE ctid = ANY(ARRAY(
+                                                   SELECT ctid FROM {name} WHERE created_at < $1 LIMIT $2
+                                               ))""", cutoff, self.chunk_size, lane=BACKGROUND)
+            count = int(status.split()[-1])
+            deleted += count
+            if count < self.chunk_size:
+                return deleted
+            await asyncio.sleep(self.chunk_pause)  # Let vacuum and other writers breathe between chunks.
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
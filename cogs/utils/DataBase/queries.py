@@ -0,0 +1,202 @@
+from typing import Dict
+import weakref
+import asyncpg
+
+
+QUERIES = {
+    # users
+    'users.upsert': """WITH inserted AS (
+                           INSERT INTO users ( id, commands_used, joined_at, messages_sent )
+                           VALUES ( $1, 0, $2, 0 )
+                           ON CONFLICT DO NOTHING
+                           RETURNING *
+                       )
+                       SELECT * FROM inserted
+                       UNION ALL
+                       SELECT * FROM users WHERE id = $1""",
+    'users.insert': """INSERT INTO users ( id, commands_used, joined_at, messages_sent )
+                       VALUES ( $1, $2, $3, $4 )
+                       ON CONFLICT DO NOTHING""",
+    'users.get': """SELECT * FROM users WHERE id = $1""",
+    'users.all': """SELECT * FROM users ORDER BY id ASC""",
+    'users.top': """SELECT * FROM users ORDER BY messages_sent DESC LIMIT $1""",
+    'users.by_ids': """SELECT * FROM users WHERE id = ANY($1::bigint[])""",
+    # Also creates missing rows, the users row of a message author may not have made it in yet.
+    'users.add_counts': """INSERT INTO users ( id, commands_used, joined_at, messages_sent )
+                           SELECT d.id, d.commands_used, now() AT TIME ZONE 'utc', d.messages_sent
+                           FROM unnest($1::bigint[], $2::int[], $3::int[]) AS d ( id, messages_sent, commands_used )
+                           ON CONFLICT ( id ) DO UPDATE
+                           SET messages_sent = users.messages_sent + EXCLUDED.messages_sent,
+                               commands_used = users.commands_used + EXCLUDED.commands_used""",
+
+    # messages
+    'messages.insert': """INSERT INTO messages ( message_id, guild_id, channel_id, author_id, content, created_at )
+                          VALUES ( $1, $2, $3, $4, $5, $6 )
+                          ON CONFLICT DO NOTHING""",
+    'messages.get': """SELECT * FROM messages WHERE message_id = $1""",
+    'messages.by_author': """SELECT * FROM messages WHERE author_id = $1""",
+    'messages.all': """SELECT * FROM messages ORDER BY author_id ASC""",
+    'messages.insert_many': """INSERT INTO messages ( message_id, guild_id, channel_id, author_id, content, created_at )
+                               SELECT * FROM unnest($1::bigint[], $2::bigint[], $3::bigint[], $4::bigint[],
+                                                    $5::text[], $6::timestamp[])
+                               ON CONFLICT DO NOTHING
+                               RETURNING guild_id""",
+    'messages.estimate': """SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::bigint
+                            FROM pg_inherits i
+                            JOIN pg_class c ON c.oid = i.inhrelid
+                            WHERE i.inhparent = 'messages'::regclass""",
+    'messages.oldest': """SELECT MIN(created_at) FROM messages""",
+    'messages.count_range': """SELECT COUNT(*) FROM messages WHERE created_at >= $1 AND created_at < $2""",
+    'messages.range': """SELECT * FROM messages
+                         WHERE created_at >= $1 AND created_at < $2
+                         ORDER BY author_id, created_at""",
+    'messages.author_stats': """SELECT COUNT(*) AS count, MIN(created_at) AS first, MAX(created_at) AS last
+                                FROM messages
+                                WHERE author_id = $1 AND ( $2::bigint IS NULL OR guild_id = $2 )""",
+    'messages.partitions': """SELECT c.relname AS name, pg_get_expr(c.relpartbound, c.oid) AS bound
+                              FROM pg_inherits i
+                              JOIN pg_class c ON c.oid = i.inhrelid
+                              WHERE i.inhparent = 'messages'::regclass""",
+
+    # message_counts, maintained by the message buffer so we never have to COUNT(*) messages.
+    'message_counts.add': """INSERT INTO message_counts ( guild_id, count )
+                             SELECT * FROM unnest($1::bigint[], $2::bigint[])
+                             ON CONFLICT ( guild_id ) DO UPDATE SET count = message_counts.count + EXCLUDED.count""",
+    'message_counts.get': """SELECT count FROM message_counts WHERE guild_id = $1""",
+    'message_counts.total': """SELECT SUM(count)::bigint FROM message_counts""",
+
+    # reps
+    'reps.insert': """INSERT INTO reps ( rep_id, user_id, author_id, repped_at, extra_info )
+                      VALUES ( $1, $2, $3, $4, $5 )
+                      ON CONFLICT DO NOTHING""",
+    # Held until the transaction ends. Keyed by the author id alone, snowflakes never collide with other keys.
+    'reps.lock_author': """SELECT pg_advisory_xact_lock($1)""",
+    'reps.insert_off_cooldown': """INSERT INTO reps ( rep_id, user_id, author_id, repped_at, extra_info )
+                                   SELECT $1, $2, $3, $4, $5
+                                   WHERE NOT EXISTS (
+                                       SELECT 1 FROM reps
+                                       WHERE author_id = $3 AND repped_at > $4 - INTERVAL '1 day'
+                                   )
+                                   ON CONFLICT DO NOTHING""",
+    'reps.latest_per_author': """SELECT author_id, MAX(repped_at) AS repped_at FROM reps
+                                 WHERE repped_at > $1
+                                 GROUP BY author_id""",
+    'reps.latest_by_author': """SELECT * FROM reps
+                                WHERE author_id = $1
+                                ORDER BY repped_at DESC
+                                LIMIT 1""",
+    'reps.by_user_id': """SELECT * FROM reps WHERE user_id = $1""",
+    'reps.by_author_id': """SELECT * FROM reps WHERE author_id = $1""",
+    'reps.all': """SELECT * FROM reps ORDER BY user_id ASC""",
+    'reps.summary': """SELECT author_id, COUNT(*) AS reps,
+                              SUM(COUNT(*)) OVER () AS total,
+                              MAX(MAX(repped_at)) OVER () AS last_rep
+                       FROM reps
+                       WHERE user_id = $1
+                       GROUP BY author_id
+                       ORDER BY reps DESC
+                       LIMIT $2""",
+    'reps.leaderboard': """SELECT user_id, COUNT(*) AS reps FROM reps
+                           GROUP BY user_id
+                           ORDER BY reps DESC
+                           LIMIT $1""",
+
+    # tags
+    'tags.get': """SELECT * FROM tags WHERE guild_id = $1 AND name = $2""",
+    'tags.insert': """INSERT INTO tags ( guild_id, creator_id, text, name, uses, created_at )
+                      VALUES ( $1, $2, $3, $4, $5, $6 )""",
+    'tags.update_text': """UPDATE tags SET text = $2 WHERE guild_id = $1 AND name = $3""",
+    'tags.rename': """UPDATE tags SET name = $3 WHERE guild_id = $1 AND name = $2""",
+    'tags.delete': """DELETE FROM tags WHERE guild_id = $1 AND name = $2""",
+    'tags.add_uses': """UPDATE tags SET uses = tags.uses + d.uses
+                        FROM unnest($1::bigint[], $2::text[], $3::int[]) AS d ( guild_id, name, uses )
+                        WHERE tags.guild_id = d.guild_id AND tags.name = d.name""",
+    'tags.names': """SELECT name FROM tags WHERE guild_id = $1 ORDER BY name""",
+    'tags.names_by_creator': """SELECT name FROM tags WHERE guild_id = $1 AND creator_id = $2 ORDER BY name""",
+    'tags.search': """SELECT name FROM tags WHERE guild_id = $1 AND name LIKE $2 LIMIT 10""",
+
+    # gconfigs
+    'gconfigs.get': """SELECT * FROM gconfigs WHERE guild_id = $1""",
+    'gconfigs.all': """SELECT * FROM gconfigs""",
+    # Writes notify the other processes, with the writers token so it can skip its own notification.
+    'gconfigs.insert': """WITH inserted AS (
+                              INSERT INTO gconfigs ( guild_id, blacklist_urls, whitelist_channels, reasons )
+                              VALUES ( $1, $2, $3, $4 )
+                              ON CONFLICT DO NOTHING
+                              RETURNING guild_id
+                          )
+                          SELECT pg_notify('gconfigs', $5::text || ':' || guild_id) FROM inserted""",
+    'gconfigs.update': """WITH updated AS (
+                              UPDATE gconfigs SET blacklist_urls = $1, whitelist_channels = $2, enabled = $3, reasons = $4
+                              WHERE guild_id = $5
+                              RETURNING guild_id
+                          )
+                          SELECT pg_notify('gconfigs', $6::text || ':' || guild_id) FROM updated""",
+
+    # docs_projects
+    'docs_projects.all': """SELECT key, url FROM docs_projects ORDER BY key""",
+    'docs_projects.upsert': """INSERT INTO docs_projects ( key, url, added_by ) VALUES ( $1, $2, $3 )
+                               ON CONFLICT ( key ) DO UPDATE SET url = $2, added_by = $3,
+                                                                 added_at = now() AT TIME ZONE 'utc'""",
+    'docs_projects.delete': """DELETE FROM docs_projects WHERE key = $1""",
+}
+
+
+class QueryRegistry(object):
+    """Named queries, prepared once on every pooled connection.
+
+    `prepare_all` is passed to the pool as its `init` callback,
+    statements that can't be prepared yet ( missing table etc. ) are prepared when they are first used."""
+
+    def __init__(self, queries: Dict[str, str] = None):
+        self.queries = dict(QUERIES if queries is None else queries)
+        # Raw connection -> { name: PreparedStatement }
+        self._prepared = weakref.WeakKeyDictionary()
+
+    def __contains__(self, name) -> bool:
+        return name in self.queries
+
+    def register(self, name: str, query: str) -> None:
+        self.queries[name] = query
+
+    @staticmethod
+    def _raw(con):
+        # Pool.acquire() hands out proxies, while `init` receives the connection itself.
+        return getattr(con, '_con', con)
+
+    def reset(self) -> None:
+        """Forget every prepared statement, for after the schema changed."""
+        self._prepared = weakref.WeakKeyDictionary()
+
+    async def prepare_all(self, con) -> None:
+        statements = self._prepared.setdefault(self._raw(con), {})
+        for name, query in self.queries.items():
+            try:
+                statements[name] = await con.prepare(query)
+            except asyncpg.PostgresError:
+                pass
+
+    async def statement(self, con, name: str):
+        statements = self._prepared.setdefault(self._raw(con), {})
+        stmt = statements.get(name)
+        if stmt is None:
+            stmt = statements[name] = await con.prepare(self.queries[name])
+        return stmt
+
+    async def _call(self, con, name: str, method: str, args, timeout):
+        stmt = await self.statement(con, name)
+        if method == 'execute':
+            await stmt.fetch(*args, timeout=timeout)
+            return stmt.get_statusmsg()
+        if method == 'executemany':
+            return await stmt.executemany(args, timeout=timeout)
+        return await getattr(stmt, method)(*args, timeout=timeout)
+
+    async def run(self, con, name: str, method: str, args, *, timeout: float = None):
+        """Run the prepared statement `name` on `con` with `method` ( fetch, fetchrow, fetchval, execute )"""
+        try:
+            return await self._call(con, name, method, args, timeout)
+        except asyncpg.InvalidCachedStatementError:
+            # The schema changed under the prepared statement, prepare it again.
+            self._prepared[self._raw(con)].pop(name, None)
+            return await self._call(con, name, method, args, timeout)
@@ -0,0 +1,12 @@
+class Record(object):
+    """Base of the row models ( `Message`, `User`, `Rep`, `Tag` ).
+
+    There can be a lot of rows in memory at once, so models are slotted and don't carry a reference each,
+    `DataBase` sets itself as `Record.db` once and every model reaches the database and the bot through it."""
+    __slots__ = ()
+
+    db = None
+
+    @property
+    def bot(self):
+        return self.db.bot
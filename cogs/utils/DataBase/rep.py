@@ -1,16 +1,38 @@
-from datetime import datetime, timedelta
-from json import dumps
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Tuple
+from json import dumps, loads
 
+from .record import Record
 
-class Rep(object):
-    def __init__(self, bot, rep_id: int, user_id: int, author_id: int,
+
+class RepSummary(NamedTuple):
+    """Aggregated reps received by one user."""
+    total: int
+    last_rep: Optional[datetime]
+    top_givers: List[Tuple[int, int]]  # ( author_id, reps ), most reps first.
+
+
+class Rep(Record):
+    __slots__ = ('rep_id', 'user_id', 'author_id', 'repped_at', '_extra_info')
+
+    def __init__(self, rep_id: int, user_id: int, author_id: int,
                  repped_at: datetime = datetime.utcnow(), extra_info: dict = None):
-        self.bot = bot
         self.rep_id = rep_id  # In most cases this is the id of the message that posted this.
         self.user_id = user_id  # The user that recieved +1 rep.
         self.author_id = author_id  # The user that gave +1 rep.
         self.repped_at = repped_at
-        self.extra_info = dumps(extra_info)
+        self._extra_info = extra_info  # A dict, or the JSON it was stored as until someone reads it.
+
+    @property
+    def extra_info(self) -> dict:
+        if isinstance(self._extra_info, str):
+            self._extra_info = loads(self._extra_info)
+        return self._extra_info
+
+    def _extra_info_json(self) -> str:
+        if isinstance(self._extra_info, str):
+            return self._extra_info
+        return dumps(self._extra_info)
 
     async def post(self, assure_24h: bool = True):
         """We shouldn't have to check for duplicate reps either. ->
@@ -24,21 +46,43 @@ class Rep(object):
                         If posting is successful, returns None.
             If post is on cooldown, returns a datetime object on when the last rep was added.
         """
-        if assure_24h:
-            query = """SELECT * FROM reps 
-                       WHERE author_id = $1 
-                       ORDER BY repped_at DESC
-                       LIMIT 1"""
-
-            record = await self.bot.db.fetch(query, self.author_id)
-            if record:
-                rep = Rep(bot=self.bot, **record[0])
-                if (rep.repped_at + timedelta(days=1)) > datetime.utcnow():
-                    return rep.repped_at
-
-        query = """INSERT INTO reps ( rep_id, user_id, author_id, repped_at, extra_info )
-                   VALUES (  $1, $2, $3, $4, $5 )
-                   ON CONFLICT DO NOTHING"""
-        await self.bot.db.execute(query, self.rep_id, self.user_id, self.author_id,
-                                  self.repped_at, f"{self.extra_info}")
+        cooldowns = self.db.rep_cooldowns
+        if not assure_24h:
+            status = await self.db.execute('reps.insert', self.rep_id, self.user_id, self.author_id,
+                                           self.repped_at, self._extra_info_json())
+            return self._posted(status)
+
+        last_rep = cooldowns.on_cooldown(self.author_id)
+        if last_rep is not None:
+            return last_rep
+
+        async with cooldowns.lock(self.author_id):
+            last_rep = cooldowns.on_cooldown(self.author_id)
+            if last_rep is not None:
+                return last_rep
+
+            # The 24h window is enforced by the insert itself. Under READ COMMITTED the NOT EXISTS only sees what
+            # was committed before the statement started, so the insert runs under a per author lock that also
+            # holds off other processes: after waiting for it, the insert sees the rep the other one committed.
+            queries, db = self.db.queries, self.db
+            args = (self.rep_id, self.user_id, self.author_id, self.repped_at, self._extra_info_json())
+            async with db.acquire() as con:
+                with db.metrics.measure('reps.insert_off_cooldown', args):
+                    async with con.transaction():
+                        await queries.run(con, 'reps.lock_author', 'execute', (self.author_id,), timeout=db.timeout)
+                        status = await queries.run(con, 'reps.insert_off_cooldown', 'execute', args,
+                                                   timeout=db.timeout)
+            if status == 'INSERT 0 1':
+                return self._posted(status)
+
+            record = await self.db.fetchrow('reps.latest_by_author', self.author_id)
+            if record is not None:
+                cooldowns.set(self.author_id, record['repped_at'])
+            return cooldowns.on_cooldown(self.author_id)
+
+    def _posted(self, status: str) -> None:
+        if status == 'INSERT 0 1':
+            self.db.rep_cooldowns.set(self.author_id, self.repped_at)
+            self.db.rep_leaderboard.add(self.user_id)
+            self.db.invalidate_rep_summary(self.user_id)
         return None
@@ -1,11 +1,13 @@
 from datetime import datetime
 
+from .record import Record
 
-class Tag:
-    def __init__(self, bot, guild_id: int, creator_id: int, text: str, name: str, uses: int = 0,
-                 created_at: datetime = datetime.utcnow()):
 
-        self.bot = bot
+class Tag(Record):
+    __slots__ = ('guild_id', 'creator_id', 'text', 'name', 'uses', 'created_at')
+
+    def __init__(self, guild_id: int, creator_id: int, text: str, name: str, uses: int = 0,
+                 created_at: datetime = datetime.utcnow()):
         self.guild_id = guild_id
         self.creator_id = creator_id
         self.text = text
@@ -13,20 +15,30 @@ class Tag:
         self.uses = uses
         self.created_at = created_at
 
+    @property
+    def total_uses(self) -> int:
+        """`uses` including the uses that haven't been written yet"""
+        return self.uses + self.db.tag_uses.pending(self.guild_id, self.name)
+
     async def post(self):
-        query = """INSERT INTO tags ( guild_id, creator_id, text, name, uses, created_at )
-                   VALUES ( $1, $2, $3, $4, $5, $6 )"""
-        await self.bot.db.execute(query, self.guild_id, self.creator_id, self.text, self.name, self.uses, self.created_at)
+        await self.db.execute('tags.insert', self.guild_id, self.creator_id, self.text, self.name,
+                              self.uses, self.created_at)
+        self.db.invalidate_tag(self.guild_id, self.name)
 
     async def update(self, text):
         self.text = text
-        query = """UPDATE tags SET text = $2 WHERE guild_id = $1 AND name = $3"""
-        await self.bot.db.execute(query, self.guild_id, self.text, self.name)
+        await self.db.execute('tags.update_text', self.guild_id, self.text, self.name)
+        self.db.invalidate_tag(self.guild_id, self.name)
 
     async def delete(self):
-        query = """DELETE FROM tags WHERE guild_id = $1 AND name = $2"""
-        await self.bot.db.execute(query, self.guild_id, self.name)
+        async with self.db.tag_uses.lock:
+            await self.db.execute('tags.delete', self.guild_id, self.name)
+            self.db.tag_uses.deleted(self.guild_id, self.name)
+        self.db.invalidate_tag(self.guild_id, self.name)
 
     async def rename(self, new_name):
-        query = """UPDATE tags SET name = $3 WHERE guild_id = $1 AND name = $2"""
-        await self.bot.db.execute(query, self.guild_id, self.name, new_name)
+        async with self.db.tag_uses.lock:
+            await self.db.execute('tags.rename', self.guild_id, self.name, new_name)
+            self.db.tag_uses.renamed(self.guild_id, self.name, new_name)
+        self.db.invalidate_tag(self.guild_id, self.name, new_name)
+        self.name = new_name
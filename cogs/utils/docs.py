@@ -0,0 +1,464 @@
+from email.utils import formatdate
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import heapq
+from json import dumps, loads
+import asyncio
+import time
+import zlib
+import re
+import os
+
+
+def finder(text, collection, *, key=None, lazy=True):
+    """Credits to github.com/Rapptz"""
+    suggestions = []
+    text = str(text)
+    pat = '.*?'.join(map(re.escape, text))
+    regex = re.compile(pat, flags=re.IGNORECASE)
+    for item in collection:
+        to_search = key(item) if key else item
+        r = regex.search(to_search)
+        if r:
+            suggestions.append((len(r.group()), r.start(), item))
+
+    def sort_key(tup):
+        if key:
+            return tup[0], tup[1], key(tup[2])
+        return tup
+
+    if lazy:
+        return (z for _, _, z in sorted(suggestions, key=sort_key))
+    else:
+        return [z for _, _, z in sorted(suggestions, key=sort_key)]
+
+
+_NON_ZERO = re.compile(b'[^\x00]')
+_BITS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+
+class FinderIndex(object):
+    """`finder` over a fixed name -> url mapping, with the same ranking but without scanning every name.
+
+    Every name is indexed by the characters it contains ( as bitsets over the names ), a query only
+    looks at names that contain all of its characters. Those are ranked like `finder` ranks them,
+    ( length of the match at the leftmost position it starts, that position, name ), and only the
+    best `limit` are kept with a heap instead of sorting every match.
+    Names or queries that aren't ASCII go through the `finder` regex, as lower() and re.IGNORECASE
+    disagree on some non-ASCII characters."""
+
+    __slots__ = ('names', 'urls', '_lowered', '_postings', '_ascii', '_non_ascii')
+
+    def __init__(self, entries: Dict[str, str]):
+        self.names: List[str] = list(entries)
+        self.urls: List[str] = list(entries.values())
+        self._lowered = [name.lower() for name in self.names]
+
+        bitmaps: Dict[str, bytearray] = {}
+        size = len(self.names) // 8 + 1
+        ascii_ = bytearray(size)
+        self._non_ascii: List[int] = []
+        for i, name in enumerate(self._lowered):
+            byte, bit = i >> 3, 1 << (i & 7)
+            if not name.isascii():
+                self._non_ascii.append(i)
+                continue
+            ascii_[byte] |= bit
+            for char in set(name):
+                bitmap = bitmaps.get(char)
+                if bitmap is None:
+                    bitmap = bitmaps[char] = bytearray(size)
+                bitmap[byte] |= bit
+
+        self._postings = {char: int.from_bytes(bitmap, 'little') for char, bitmap in bitmaps.items()}
+        self._ascii = int.from_bytes(ascii_, 'little')
+
+    def __len__(self):
+        return len(self.names)
+
+    def _candidates(self, query: str):
+        """Indexes of the ASCII names that contain every character of `query`"""
+        bits = self._ascii
+        # Rarest characters first, the bitset shrinks fastest.
+        for char in sorted(set(query), key=lambda c: self._postings.get(c, 0).bit_length()):
+            bits &= self._postings.get(char, 0)
+            if not bits:
+                return
+        # Walking the set bytes is much cheaper than peeling single bits off a big int.
+        for match in _NON_ZERO.finditer(bits.to_bytes(len(self.names) // 8 + 1, 'little')):
+            base = match.start() << 3
+            for bit in _BITS[match.group()[0]]:
+                yield base + bit
+
+    @staticmethod
+    def _pattern(text: str):
+        """Matches a name like `finder`s regex searches it: the search can only succeed at the first occurrence
+        of the first character ( if the rest follows a later one, it follows that one as well ) and the lazy .*?
+        takes every next character as early as possible. The group spans what `finder` would have matched."""
+        if not text:
+            return re.compile('()')
+        first = re.escape(text[0])
+        return re.compile(f'[^{first}]*({".*?".join(map(re.escape, text))})', flags=re.IGNORECASE)
+
+    def search(self, text, limit: int = 8) -> List[Tuple[str, str]]:
+        """The `limit` best ( name, url ) matches of `text`, as `finder(text, entries.items(), key=...)[:limit]`"""
+        text = str(text)
+        if not text.isascii():
+            items = zip(self.names, self.urls)
+            return finder(text, items, key=lambda t: t[0], lazy=False)[:limit]
+
+        match = self._pattern(text.lower()).match
+        names, lowered = self.names, self._lowered
+        ranked = []
+        for i in self._candidates(text.lower()):
+            m = match(lowered[i])
+            if m is not None:
+                ranked.append((m.end() - m.start(1), m.start(1), names[i], i))
+
+        if self._non_ascii:
+            search = re.compile('.*?'.join(map(re.escape, text)), flags=re.IGNORECASE).search
+            for i in self._non_ascii:
+                m = search(names[i])
+                if m is not None:
+                    ranked.append((m.end() - m.start(), m.start(), names[i], i))
+
+        return [(name, self.urls[i]) for _, _, name, i in heapq.nsmallest(limit, ranked)]
+
+
+# The Sphinx entry regex, made to run over many lines at once: whitespace never spans a line break
+# and trailing whitespace is left out of the display name, as the per line version rstrip()s.
+# After that rstrip() a line without a display name didn't match, so the display name can't be empty here.
+ENTRY_REGEX = re.compile(r'(?m)^(.+?)[^\S\n]+(\S*:\S*)[^\S\n]+(-?\d+)[^\S\n]+(\S+)[^\S\n]+(\S.*?)[^\S\n]*$')
+
+
+class InventoryParser(object):
+    """Incremental objects.inv parser, `feed` it the raw bytes as they arrive and `close` it for the entries.
+
+    The compressed body is inflated chunk by chunk into one bytearray. Each time the complete lines in it
+    are decoded at once out of a memoryview, matched with one `finditer` and dropped from the buffer,
+    so nothing is copied or sliced per line."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.result: Dict[str, str] = {}
+        self.project = None
+        self.version = None
+        self._header: List[str] = []
+        self._buffer = bytearray()
+        self._decompressor = None
+
+    def feed(self, data: bytes) -> None:
+        if self._decompressor is None:
+            self._buffer += data
+            while len(self._header) < 4:
+                pos = self._buffer.find(b'\n')
+                if pos == -1:
+                    return
+                self._header.append(self._buffer[:pos].decode('utf-8'))
+                del self._buffer[:pos + 1]
+            self._read_header()
+            data = bytes(self._buffer)
+            self._buffer.clear()
+            self._decompressor = zlib.decompressobj()
+        self._read_lines(self._decompressor.decompress(data))
+
+    def _read_header(self) -> None:
+        inv_version, project, version, compression = (line.rstrip() for line in self._header)
+        if inv_version != '# Sphinx inventory version 2':
+            raise RuntimeError('Invalid objects.inv file version.')
+        self.project = project[11:]  # Project name; "# Project: <name>"
+        self.version = version[11:]  # Version name; "# Version: <version>"
+        if 'zlib' not in compression:  # says if it's a zlib header
+            raise RuntimeError('Invalid objects.inv file, not z-lib compatible.')
+
+    def _read_lines(self, data: bytes) -> None:
+        buffer = self._buffer
+        buffer += data
+        end = buffer.rfind(b'\n')
+        if end == -1:
+            return
+        # Every complete line is decoded in one go, straight out of the buffer.
+        with memoryview(buffer) as view:
+            text = str(view[:end], 'utf-8')
+        del buffer[:end + 1]  # A bytearray can't be resized while it is viewed.
+        self._add(text)
+
+    def _add(self, text: str) -> None:
+        result, url = self.result, self.url
+        discord_py = self.project == 'discord.py'
+        for match in ENTRY_REGEX.finditer(text):
+            name, directive, prio, location, dispname = match.groups()
+            domain, _, subdirective = directive.partition(':')
+            if directive == 'py:module' and name in result:
+                # From the Sphinx Repository:
+                # due to a bug in 1.1 and below,
+                # two inventory entries are created
+                # for Python modules, and the first
+                # one is correct
+                continue
+
+            if directive == 'std:doc':  # Most documentation pages have a label
+                subdirective = 'label'
+
+            if location.endswith('$'):
+                location = location[:-1] + name
+
+            key = name if dispname == '-' else dispname
+            prefix = f'{subdirective}:' if domain == 'std' else ''
+
+            if discord_py:
+                key = key.replace('discord.ext.commands.', '').replace('discord.', '')
+
+            result[f'{prefix}{key}'] = os.path.join(url, location)
+
+    def close(self) -> Dict[str, str]:
+        if self._decompressor is None:
+            raise RuntimeError('Invalid objects.inv file, it ended in the header.')
+        self._read_lines(self._decompressor.flush())
+        if self._buffer:  # No newline after the last entry.
+            self._add(self._buffer.decode('utf-8'))
+            self._buffer.clear()
+        return self.result
+
+
+def parse_object_inv(data: bytes, url: str) -> Dict[str, str]:
+    parser = InventoryParser(url)
+    parser.feed(data)
+    return parser.close()
+
+
+class Inventory(object):
+    """The parsed objects.inv of one documentation site, with what we need to revalidate it."""
+
+    __slots__ = ('url', 'entries', 'etag', 'last_modified', 'checked_at', '_index')
+
+    def __init__(self, url: str, entries: Dict[str, str], *, etag: str = None,
+                 last_modified: str = None, checked_at: float = None):
+        self.url = url
+        self.entries = entries
+        self.etag = etag
+        self.last_modified = last_modified
+        self.checked_at = checked_at or time.time()
+        self._index = None
+
+    @property
+    def index(self) -> FinderIndex:
+        """Built on first use"""
+        if self._index is None:
+            self._index = FinderIndex(self.entries)
+        return self._index
+
+    def dump(self) -> bytes:
+        """A JSON header line followed by the zlib compressed `name\\0location` lines,
+        locations are stored relative to `url`."""
+        header = dumps({'url': self.url, 'etag': self.etag, 'last_modified': self.last_modified,
+                        'checked_at': self.checked_at, 'count': len(self.entries)})
+        base = self.url.rstrip('/') + '/'
+        body = '\n'.join(f'{name}\0{location[len(base):] if location.startswith(base) else location}'
+                         for name, location in self.entries.items())
+        return header.encode() + b'\n' + zlib.compress(body.encode(), 6)
+
+    @classmethod
+    def load(cls, data: bytes) -> 'Inventory':
+        header, _, body = data.partition(b'\n')
+        header = loads(header)
+        url = header['url']
+        entries = {}
+        if header['count']:
+            for line in zlib.decompress(body).decode().split('\n'):
+                name, _, location = line.partition('\0')
+                entries[name] = location if '://' in location else os.path.join(url, location)
+        return cls(url, entries, etag=header['etag'], last_modified=header['last_modified'],
+                   checked_at=header['checked_at'])
+
+
+# Project keys name their cache file, so they are kept to something safe in a path.
+PROJECT_KEY_RE = re.compile(r'[a-z0-9][a-z0-9_.-]{0,31}')
+
+
+class DocsIndex(object):
+    """Sphinx inventories of every project in `projects` ( key -> documentation url ).
+
+    Nothing is loaded up front, a projects inventory is read from its cache file in `path` ( or downloaded
+    if there is none ) the first time it is searched. At most `max_resident` inventories are kept in memory,
+    the least recently searched one is dropped when another one is loaded, its cache file stays so it is
+    cheap to load again. Every `check_interval` seconds the resident inventories that haven't been
+    revalidated for `revalidate_interval` seconds are revalidated in the background with a conditional
+    request ( ETag / Last-Modified ), unchanged inventories are not downloaded again."""
+
+    def __init__(self, session, projects: Dict[str, str], *, path: str = 'docs_cache',
+                 revalidate_interval: float = 6 * 3600, check_interval: float = 600,
+                 max_resident: int = 4, loop=None):
+        self.session = session
+        self.projects = {key: url.rstrip('/') for key, url in projects.items()}
+        self.path = path
+        self.revalidate_interval = revalidate_interval
+        self.check_interval = check_interval
+        self.max_resident = max_resident
+        self.loop = loop or asyncio.get_event_loop()
+        self.inventories: 'OrderedDict[str, Inventory]' = OrderedDict()  # Least recently used first.
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._task = None
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.projects
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f'{key}.inventory')
+
+    def _lock(self, key: str) -> asyncio.Lock:
+        return self._locks.setdefault(key, asyncio.Lock())
+
+    def _read(self, key: str) -> Optional[Inventory]:
+        try:
+            with open(self._file(key), 'rb') as f:
+                inventory = Inventory.load(f.read())
+        except (OSError, ValueError, KeyError, zlib.error):
+            return None
+        # A cached inventory of a different url is of no use.
+        return inventory if inventory.url == self.projects.get(key) else None
+
+    def _write(self, key: str, data: bytes) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        tmp = self._file(key) + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, self._file(key))
+
+    def _keep(self, key: str, inventory: Inventory) -> None:
+        """Make `inventory` resident, dropping the least recently used ones over `max_resident`."""
+        self.inventories[key] = inventory
+        self.inventories.move_to_end(key)
+        while len(self.inventories) > self.max_resident:
+            self.inventories.popitem(last=False)
+
+    def stale(self) -> List[str]:
+        """Resident inventories that are due to be revalidated"""
+        now = time.time()
+        return [key for key, inventory in self.inventories.items()
+                if now - inventory.checked_at >= self.revalidate_interval]
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = self.loop.create_task(self._revalidate_loop())
+
+    async def _revalidate_loop(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            stale = self.stale()
+            if stale:
+                await self.refresh(stale)
+
+    async def refresh(self, keys=None) -> Dict[str, Exception]:
+        """Revalidate the inventories of `keys` ( every resident one by default ) concurrently,
+        returns the errors of those that failed, the others are unaffected by them."""
+        keys = list(self.inventories if keys is None else keys)
+        results = await asyncio.gather(*(self.fetch(key) for key in keys), return_exceptions=True)
+        errors = {}
+        for key, result in zip(keys, results):
+            if isinstance(result, asyncio.CancelledError):
+                raise result
+            if isinstance(result, Exception):
+                print(f'Failed to revalidate the {key} docs inventory: {result!r}')
+                errors[key] = result
+        return errors
+
+    async def fetch(self, key: str) -> Inventory:
+        """Revalidate ( or download ) the inventory of `key`, concurrent calls share one request."""
+        async with self._lock(key):
+            return await self._fetch(key)
+
+    async def _fetch(self, key: str) -> Inventory:
+        url = self.projects[key]
+        cached = self.inventories.get(key)
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            headers['If-Modified-Since'] = cached.last_modified or formatdate(cached.checked_at, usegmt=True)
+
+        async with self.session.get(url + '/objects.inv', headers=headers) as resp:
+            if resp.status == 304 and cached is not None:
+                cached.checked_at = time.time()
+                return cached
+            if resp.status != 200:
+                raise RuntimeError('Cannot build docs lookup table, try again later.')
+
+            etag, last_modified = resp.headers.get('ETag'), resp.headers.get('Last-Modified')
+            # Parsed as it downloads, the body is never held in memory as a whole.
+            parser = InventoryParser(url)
+            async for chunk in resp.content.iter_chunked(16 * 1024):
+                parser.feed(chunk)
+            entries = parser.close()
+
+        inventory = Inventory(url, entries, etag=etag, last_modified=last_modified)
+        await self.loop.run_in_executor(None, getattr, inventory, 'index')  # Build it off the loop.
+        if self.projects.get(key) == url:  # Removed or re-added while we were downloading.
+            self._keep(key, inventory)
+            await self.loop.run_in_executor(None, self._write, key, inventory.dump())
+        return inventory
+
+    async def get(self, key: str) -> Inventory:
+        """The inventory of `key`, loaded from disk or downloaded if it isn't resident."""
+        inventory = self.inventories.get(key)
+        if inventory is not None:
+            self.inventories.move_to_end(key)
+            return inventory
+
+        async with self._lock(key):
+            inventory = self.inventories.get(key)  # Someone else may have loaded it while we waited.
+            if inventory is not None:
+                return inventory
+
+            inventory = await self.loop.run_in_executor(None, self._read, key)
+            if inventory is None:
+                return await self._fetch(key)
+            await self.loop.run_in_executor(None, getattr, inventory, 'index')
+            self._keep(key, inventory)
+
+        if time.time() - inventory.checked_at >= self.revalidate_interval:
+            self.loop.create_task(self.refresh([key]))  # Answer from the cache now, revalidate behind it.
+        return inventory
+
+    async def search(self, key: str, text: str, limit: int = 8) -> List[Tuple[str, str]]:
+        """The `limit` best ( name, url ) matches for `text` in the inventory of `key`"""
+        return (await self.get(key)).index.search(text, limit)
+
+    async def add_project(self, key: str, url: str) -> Inventory:
+        """Register ( or move ) `key` to the docs at `url`, returns its inventory.
+
+        The inventory is downloaded right away, so a url that isn't a Sphinx project raises and
+        the registry is left as it was."""
+        if not PROJECT_KEY_RE.fullmatch(key):
+            raise ValueError(f'Invalid project name {key!r}')
+        url = url.rstrip('/')
+        previous = self.projects.get(key)
+        if previous == url:
+            return await self.get(key)
+
+        async with self._lock(key):
+            self.projects[key] = url
+            self.inventories.pop(key, None)
+            try:
+                return await self._fetch(key)
+            except BaseException:
+                if previous is None:
+                    del self.projects[key]
+                else:
+                    self.projects[key] = previous
+                raise
+
+    def remove_project(self, key: str) -> None:
+        """Forget `key`, its inventory and its cache file"""
+        self.projects.pop(key, None)
+        self.inventories.pop(key, None)
+        self._locks.pop(key, None)
+        try:
+            os.remove(self._file(key))
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
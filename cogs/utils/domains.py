@@ -0,0 +1,72 @@
+from typing import Dict, Iterable, Optional
+import re
+
+# Captures the netloc of every link. Only characters a netloc can hold are taken, so whatever a link is wrapped
+# in ( `<...>`, `(...)`, markdown, a trailing comma ) never ends up in the host and keeps it from matching.
+URL_RE = re.compile(r"https?://([\w.\-\[\]:@~]+)", flags=re.IGNORECASE)
+
+
+def normalize_domain(value: str) -> str:
+    """The bare, lower cased host of a blacklist entry or netloc ( `https://User@Ex.com:80/x` -> `ex.com` )"""
+    value = value.strip().lower()
+    if '://' in value:
+        value = value.split('://', 1)[1]
+    value = value.split('/', 1)[0].rsplit('@', 1)[-1]
+    if not value.startswith('['):  # Leave IPv6 literals alone, their colons aren't a port.
+        value = value.split(':', 1)[0]
+    return value.strip('.')
+
+
+def is_domain(entry: str) -> bool:
+    """Whether `entry` is a host, a bare word like `grabify` would only match a host named exactly that."""
+    domain = normalize_domain(entry)
+    return '.' in domain or domain.startswith('[')
+
+
+def _labels(domain: str):
+    return [label for label in domain.split('.') if label]
+
+
+class DomainTrie(object):
+    """Blacklisted domains, stored label by label from the top level domain down.
+
+    `match` walks the labels of a host from the right, so a lookup costs the amount of labels
+    in the host no matter how many domains are stored. An entry matches its own domain and every
+    subdomain of it: `ab.com` matches `ab.com` and `www.ab.com`, but not `crab.com`."""
+
+    __slots__ = ('_root', '_size')
+
+    _END = ''  # Labels are never empty, so this key can't clash with one.
+
+    def __init__(self, entries: Iterable[str] = ()):
+        self._root: Dict[str, dict] = {}
+        self._size = 0
+        for entry in entries:
+            self.add(entry)
+
+    def __len__(self):
+        return self._size
+
+    def add(self, entry: str) -> None:
+        """Store `entry`, `match` returns the entry as given for hosts under it"""
+        domain = normalize_domain(entry)
+        if not domain:
+            return
+        node = self._root
+        for label in reversed(_labels(domain)):
+            node = node.setdefault(label, {})
+        if self._END not in node:
+            self._size += 1
+            node[self._END] = entry
+
+    def match(self, netloc: str) -> Optional[str]:
+        """The entry that `netloc` falls under, the broadest one if there are several"""
+        node = self._root
+        for label in reversed(_labels(normalize_domain(netloc))):
+            node = node.get(label)
+            if node is None:
+                return None
+            entry = node.get(self._END)
+            if entry is not None:
+                return entry
+        return None
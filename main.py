@@ -42,12 +42,17 @@ class Tim(commands.AutoShardedBot):
         self.session = ClientSession(loop=self.loop)
         self.start_time = datetime.datetime.utcnow()
         self.clean_text = commands.clean_content(escape_markdown=True, fix_channel_mentions=True)
+        self.db = None
+        self.db_ready = asyncio.Event()  # Set once the pool is up and the migrations are done.
 
     """  Events   """
 
     async def on_connect(self):
         """Connect DB before bot is ready to assure that no calls are made before its ready"""
+        if self.db is not None:
+            return  # Reconnecting, keep the existing pool and its buffers.
         self.db = await DataBase.create_pool(bot=self, uri=POSTGRES, loop=self.loop)
+        self.db_ready.set()
 
     async def on_ready(self):
         print(f'Successfully logged in as {self.user}\nSharded to {len(self.guilds)} guilds')
@@ -55,6 +60,7 @@ class Tim(commands.AutoShardedBot):
         self.welcomes = self.guild.get_channel(739205949134471241)
         await self.change_presence(activity=discord.Game(name='use the prefix "tim."'))
 
+        await self.db_ready.wait()  # Cogs use the database as they load.
         for ext in initial_cogs:
             self.load_extension(ext)
         print(f'Loaded all extensions after {human_timedelta(self.start_time, brief=True, suffix=False)}')
@@ -82,6 +88,8 @@ class Tim(commands.AutoShardedBot):
         if message.author.bot:
             return
 
+        # Migrations can take a while on startup, messages wait for them instead of failing.
+        await self.db_ready.wait()
         ctx = await self.get_context(message=message)
 
         if ctx.command is None:
@@ -134,6 +142,11 @@ class Tim(commands.AutoShardedBot):
         else:
             raise error
 
+    async def close(self):
+        await super().close()
+        if self.db is not None:
+            await self.db.close()  # Drain buffered writes.
+
     """   Functions   """
 
     async def get_context(self, message, *, cls=SyltesContext):